@@ -0,0 +1,171 @@
+import argparse
+import json
+import sys
+
+from date_parsing import is_valid_date
+from oppgave1 import (compare_sentences, multiplication_table, sum_numbers,
+                      swap_fruits)
+
+# --------------------------------------------------------------------------- #
+"""
+Non-interactive batch mode for tasks 1A-1D and 2A.
+
+The tasks ask for their input with input(), one prompt at a time. Here
+the same work is done by plain functions taking their input as arguments,
+and run_batch pushes a stream of records through them.
+
+Every record is a JSON line with the arguments of a task, as a list
+([3, 1]) or as an object ({"index_1": 3, "index_2": 1}). The task is given
+for the whole batch, or per record with a "task" key. Every record gets a
+JSON line back, {"result": ...} or {"error": "..."}, written to the output
+in large chunks instead of a print per line.
+
+Run with:
+    python batch_tasks.py --task 1a requests.jsonl
+    python batch_tasks.py < requests.jsonl > results.jsonl
+"""
+
+# The function doing each task, by task name.
+TASKS = {
+    '1a': sum_numbers,
+    '1b': compare_sentences,
+    '1c': multiplication_table,
+    '1d': swap_fruits,
+    '2a': is_valid_date,
+}
+
+WRITE_CHUNK_LINES = 10_000  # Result lines joined per write
+
+
+# --------------------------------------------------------------------------- #
+# Records
+
+def read_records(file):
+    """
+    Reads JSON records from a file with one record per line. Blank lines
+    are skipped.
+
+    Yields:
+        tuple[int, object]: The line number and the record, or the
+        json.JSONDecodeError if the line is not valid JSON.
+    """
+    for line_number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, e
+
+
+def run_record(record, task=None):
+    """
+    Runs the task of one record.
+
+    Args:
+        record (list | tuple | dict | object): The arguments, or a single
+            argument.
+        task (str, optional): The task, if the record has no "task" key.
+    Returns:
+        object: The result of the task.
+    Raises:
+        ValueError, IndexError, TypeError, KeyError: If the record or the
+            task's input is invalid.
+    """
+    if isinstance(record, dict):
+        record = dict(record)
+        task = record.pop('task', task)
+    if task is None:
+        raise KeyError('No task given for the record')
+    if not isinstance(task, str):
+        raise ValueError(f'"task" must be a task name, not {task!r}')
+    func = TASKS[task.lower()]
+    if isinstance(record, dict):
+        return func(**record)
+    if isinstance(record, (list, tuple)):
+        return func(*record)
+    return func(record)
+
+
+# --------------------------------------------------------------------------- #
+# Batch
+
+def run_batch(records, output, task=None):
+    """
+    Runs many records and writes one JSON result line per record.
+
+    Args:
+        records (Iterable[object]): The records.
+        output (TextIO): Where the result lines are written.
+        task (str, optional): The task of records without a "task" key.
+    Returns:
+        tuple[int, int]: The number of records and of errors.
+    """
+    return run_numbered_batch(enumerate(records, start=1), output, task)
+
+
+def run_numbered_batch(numbered_records, output, task=None):
+    """
+    Runs (line number, record) pairs, like the ones from read_records,
+    and writes one JSON result line per record with its line number.
+
+    Returns:
+        tuple[int, int]: The number of records and of errors.
+    """
+    lines = []
+    count = errors = 0
+    for line_number, record in numbered_records:
+        count += 1
+        try:
+            if isinstance(record, json.JSONDecodeError):
+                raise ValueError(f'Invalid JSON: {record.msg}')
+            result = {'result': run_record(record, task)}
+        except (ValueError, IndexError, TypeError, KeyError) as e:
+            errors += 1
+            result = {'error': f'{type(e).__name__}: {e}'}
+        result['line'] = line_number
+        lines.append(json.dumps(result, ensure_ascii=False))
+        if len(lines) >= WRITE_CHUNK_LINES:
+            output.write('\n'.join(lines) + '\n')
+            lines.clear()
+    if lines:
+        output.write('\n'.join(lines) + '\n')
+    return count, errors
+
+
+def main():
+    """
+    Runs a batch from files or stdin and writes the results to a file or
+    stdout.
+    """
+    parser = argparse.ArgumentParser(
+        description='Runs tasks 1A-1D and 2A on JSON line records.')
+    parser.add_argument('inputs', nargs='*', default=['-'],
+                        help='JSONL files, or - for stdin (the default)')
+    parser.add_argument('--task', choices=sorted(TASKS),
+                        help='the task of records without a "task" key')
+    parser.add_argument('--output', default='-',
+                        help='file for the results, or - for stdout')
+    args = parser.parse_args()
+
+    output = (sys.stdout if args.output == '-' else
+              open(args.output, 'w', encoding='utf-8', buffering=1 << 20))
+    count = errors = 0
+    try:
+        for name in args.inputs:
+            file = (sys.stdin if name == '-' else
+                    open(name, encoding='utf-8', buffering=1 << 20))
+            with file:
+                handled, failed = run_numbered_batch(read_records(file),
+                                                     output, args.task)
+            count += handled
+            errors += failed
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f'{count} records handled, {errors} errors', file=sys.stderr)
+
+
+# --------------------------------------------------------------------------- #
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,883 @@
+import argparse
+from contextlib import redirect_stdout
+import csv
+from datetime import date, datetime, timedelta
+import fnmatch
+import json
+import os
+import platform
+import random as rd
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from colours import hex_to_rgb, pixels_to_hex, rgb_to_hex_batch
+from date_parsing import date_differences, parse_date, parse_date_ordinal
+from file_sorter import (DEFAULT_MAGIC_BYTES, SortingRules,
+                         classify_by_extension, sort_files)
+from ipv4 import CidrIndex, format_ipv4, parse_cidr, parse_ipv4_batch
+from multiplication_tables import write_tables
+from summation import range_sum
+
+# --------------------------------------------------------------------------- #
+"""
+Benchmarks for the performance work on the tasks.
+
+Speedups, comparing the old and the new way of doing the same work:
+    python benchmarks.py [speedups [benchmark name ...]]
+The suite, measuring the task modules on deterministic synthetic data:
+    python benchmarks.py suite [--rows N] [--output results.json] [module ...]
+Comparing two suite results, flagging regressions:
+    python benchmarks.py compare old.json new.json [--threshold 0.1]
+"""
+
+
+# --------------------------------------------------------------------------- #
+# Utility
+
+def rows_per_second(func, rows):
+    """
+    Runs func over all rows and returns the throughput in rows/sec.
+    """
+    start = time.perf_counter()
+    func(rows)
+    elapsed = time.perf_counter() - start
+    return len(rows) / elapsed if elapsed else float('inf')
+
+
+def median(values):
+    """
+    Returns the median of a list of numbers.
+    """
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def measure(name, func, data=None, rows=None, setup=None, repeat=3):
+    """
+    Measures a function on the same data "repeat" times, and once more
+    with tracemalloc for the peak memory. With only a few timed calls,
+    the latency is given as the fastest and the median call, since higher
+    percentiles would just be the slowest call.
+
+    Args:
+        name (str): The name of the case in the results.
+        func (Callable): Called with the data, or what setup returns.
+        data (Sized, optional): The argument for func.
+        rows (int, optional): Rows handled per call. Defaults to len(data).
+        setup (Callable, optional): Makes a new argument for every call,
+            untimed, for functions that use up their input (like moving
+            files).
+        repeat (int): Timed calls.
+    Returns:
+        dict: Throughput, peak memory and the min and median latency in
+        ms.
+    """
+    rows = len(data) if rows is None else rows
+    latencies = []
+    for _ in range(repeat):
+        argument = setup() if setup else data
+        start = time.perf_counter()
+        func(argument)
+        latencies.append(time.perf_counter() - start)
+
+    argument = setup() if setup else data
+    tracemalloc.start()
+    func(argument)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(latencies)
+    return {
+        'case': name,
+        'rows': rows,
+        'rows_per_sec': rows / best if best else float('inf'),
+        'peak_memory_bytes': peak,
+        'min_ms': best * 1000,
+        'median_ms': median(latencies) * 1000,
+    }
+
+
+def print_comparison(name, before, after):
+    """
+    Prints the throughput before and after, and the speedup.
+    """
+    print(f'{name}:')
+    print(f'\tbefore: {before:>14,.0f} rows/sec')
+    print(f'\tafter:  {after:>14,.0f} rows/sec')
+    print(f'\tspeedup: {after / before:.1f}x')
+
+
+# --------------------------------------------------------------------------- #
+# Date parsing
+
+def generate_loan_dates(rows, distinct_days=400, seed=1):
+    """
+    Generates dates in the format "dd/mm/yyyy" over a limited range of days,
+    so dates repeat the same way as loan dates in bokutlån.csv.
+    """
+    rd.seed(seed)
+    first_day = date(2023, 9, 1)
+    return [(first_day + timedelta(days=rd.randrange(distinct_days)))
+            .strftime('%d/%m/%Y') for _ in range(rows)]
+
+
+def parse_dates_with_strptime(date_strings):
+    """
+    The old way: strptime once to validate and once to store the date.
+    """
+    for date_str in date_strings:
+        datetime.strptime(date_str, '%d/%m/%Y')
+        datetime.strptime(date_str, '%d/%m/%Y').toordinal()
+
+
+def parse_dates_with_date_parsing(date_strings):
+    """
+    The new way: the shared cached parser, used to validate and to store.
+    """
+    for date_str in date_strings:
+        parse_date(date_str)
+        parse_date_ordinal(date_str)
+
+
+def benchmark_date_parsing(rows=200_000):
+    """
+    Compares strptime with the date_parsing module for loan dates.
+    """
+    date_strings = generate_loan_dates(rows)
+    parse_date.cache_clear()
+    before = rows_per_second(parse_dates_with_strptime, date_strings)
+    after = rows_per_second(parse_dates_with_date_parsing, date_strings)
+    print_comparison(f'Date parsing ({rows:,} rows)', before, after)
+
+
+def days_between_with_strptime(pairs):
+    """
+    The old way: task 3B parsed both dates with strptime per pair.
+    """
+    return [abs(datetime.strptime(first, '%d/%m/%Y')
+                - datetime.strptime(second, '%d/%m/%Y')).days
+            for first, second in pairs]
+
+
+def benchmark_date_differences(rows=1_000_000):
+    """
+    Compares strptime per pair with date_differences.
+    """
+    first_dates = generate_loan_dates(rows, seed=1)
+    second_dates = generate_loan_dates(rows, seed=2)
+    pairs = list(zip(first_dates, second_dates))
+    parse_date.cache_clear()
+    before = rows_per_second(days_between_with_strptime, pairs)
+    after = rows_per_second(date_differences, pairs)
+    print_comparison(f'Date differences ({rows:,} rows)', before, after)
+
+
+# --------------------------------------------------------------------------- #
+# Loan records
+
+LOAN_CSV_HEADER = ('Fornavn,Etternavn,Boktittel,Sjanger,Lånedato,'
+                   'Låneperiode,Forlenget,Tilbakelevert\n')
+# Malformed values found in bokutlån.csv, by column index.
+MALFORMED_LOAN_VALUES = [(4, '04.10.2023'), (3, 'Friksjon'), (3, 'Sakprasa'),
+                         (6, ''), (6, '1a')]
+
+
+def generate_loan_lines(rows, seed=1, malformed_share=0.0):
+    """
+    Generates CSV lines (without header) in the format of bokutlån.csv.
+    A share of the rows gets one of the malformed values in
+    MALFORMED_LOAN_VALUES.
+    """
+    rd.seed(seed)
+    titles = ['Mengele Zoo', 'Ringenes Herre', 'Sapiens', '1984',
+              'Alkymisten', 'Fuglane', 'Den tause pasienten']
+    genres = ['Fiksjon', 'Krim', 'Sakprosa', 'Fantasy']
+    loan_dates = generate_loan_dates(rows, seed=seed)
+    lines = []
+    for i in range(rows):
+        fields = [f'Name{i % 5000}', f'Surname{i % 7919}', rd.choice(titles),
+                  rd.choice(genres), loan_dates[i], '14',
+                  str(rd.choice((0, 7, 14))), rd.choice(('Ja', 'Nei'))]
+        if malformed_share and rd.random() < malformed_share:
+            column, value = rd.choice(MALFORMED_LOAN_VALUES)
+            fields[column] = value
+        lines.append(','.join(fields) + '\n')
+    return lines
+
+
+def write_loan_csv(filename, rows, seed=1, malformed_share=0.01,
+                   chunk_rows=100_000):
+    """
+    Writes a loan CSV file in the format of bokutlån.csv, chunk_rows at a
+    time so files of 10^7 rows are not held in memory.
+    """
+    with open(filename, 'w', encoding='utf-8', newline='') as file:
+        file.write(LOAN_CSV_HEADER)
+        for chunk, first_row in enumerate(range(0, rows, chunk_rows)):
+            file.writelines(generate_loan_lines(
+                min(chunk_rows, rows - first_row), seed=seed + chunk,
+                malformed_share=malformed_share))
+
+
+def construct_loans(loan_class, rows):
+    """
+    Creates one loan_class object per CSV row.
+    """
+    return [loan_class(row[0], row[1], row[2], row[3], row[4], row[7],
+                       loan_period=row[5], extended=row[6])
+            for row in rows]
+
+
+def construct_trusted_loans(loan_class, typed_rows):
+    """
+    Creates one loan_class object per already converted row, using the
+    trusted path.
+    """
+    return [loan_class(*row, trusted=True) for row in typed_rows]
+
+
+def memory_per_object(func, count):
+    """
+    Returns the bytes allocated per object by func, which must return
+    the objects so they are still alive when memory is measured.
+    """
+    tracemalloc.start()
+    objects = func()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return allocated / count
+
+
+def benchmark_loan_records(rows=1_000_000):
+    """
+    Compares memory per object and construction throughput of LoanedBooks
+    with CompactLoanedBooks, validated and trusted.
+    """
+    from loans import CompactLoanedBooks, LoanedBooks, loan_datetime
+
+    # The rows are read before measuring, so only the objects are counted.
+    csv_rows = list(csv.reader(generate_loan_lines(rows)))
+    # A trusted feed has converted values already, like the binary snapshot.
+    typed_rows = [(row[0], row[1], row[2], row[3],
+                   loan_datetime(parse_date_ordinal(row[4])), row[7],
+                   int(row[5]), int(row[6])) for row in csv_rows]
+    variants = [
+        ('LoanedBooks', lambda: construct_loans(LoanedBooks, csv_rows)),
+        ('CompactLoanedBooks', lambda: construct_loans(
+            CompactLoanedBooks, csv_rows)),
+        ('CompactLoanedBooks (trusted)', lambda: construct_trusted_loans(
+            CompactLoanedBooks, typed_rows)),
+    ]
+    print(f'Loan records ({rows:,} rows):')
+    for name, construct in variants:
+        start = time.perf_counter()
+        construct()
+        elapsed = time.perf_counter() - start
+        memory = memory_per_object(construct, rows)
+        print(f'\t{name:<30} {rows / elapsed:>12,.0f} rows/sec '
+              f'{memory:>8,.0f} bytes/row')
+
+
+# --------------------------------------------------------------------------- #
+# File classification
+
+def generate_mixed_file_tree(folder, count, seed=1):
+    """
+    Creates count files with a mix of extensions and name patterns in
+    folder. Files named "data<i>" have no extension, and every other one
+    starts with the magic bytes of a PNG.
+    """
+    rng = rd.Random(seed)
+    extensions = ['txt', 'TXT', 'jpg', 'png', 'pdf', 'csv', 'py', 'mp3',
+                  'docx', 'log', 'zip', '']
+    prefixes = ['report_', 'img', 'backup-', 'notes', 'data']
+    os.makedirs(folder, exist_ok=True)
+    for i in range(count):
+        extension = rng.choice(extensions)
+        name = f'{rng.choice(prefixes)}{i}'
+        name = f'{name}.{extension}' if extension else name
+        fd = os.open(os.path.join(folder, name), os.O_CREAT | os.O_WRONLY)
+        if name.startswith('data') and not extension and i % 2:
+            os.write(fd, b'\x89PNG\r\n\x1a\n')
+        os.close(fd)
+
+
+SORTING_PATTERNS = [('report_*.csv', 'reports'), ('backup-*', 'backups'),
+                    (r're:img\d+\.(jpg|png)', 'images')]
+SORTING_EXTENSIONS = {'txt': 'text', 'log': 'text', 'py': 'code',
+                      'docx': 'documents', 'pdf': 'documents'}
+
+
+def classify_rule_by_rule():
+    """
+    The naive way: returns a classifier testing every rule, one by one.
+    """
+    rules = [(re.compile(pattern[3:]) if pattern.startswith('re:')
+              else re.compile(fnmatch.translate(pattern), re.IGNORECASE),
+              file_type) for pattern, file_type in SORTING_PATTERNS]
+
+    def classify(entry):
+        for regex, file_type in rules:
+            if regex.fullmatch(entry.name):
+                return file_type
+        extension = os.path.splitext(entry.name)[1].lstrip('.')
+        return SORTING_EXTENSIONS.get(extension.lower(), extension)
+    return classify
+
+
+def benchmark_file_classification(count=1_000_000):
+    """
+    Sorts a real temporary tree of mixed files with each way to classify
+    them: by extension (today's sorter), the rules engine with more and
+    more rules, and the same rules tested one by one. Every run gets a
+    fresh tree, made before the timing starts.
+    """
+    variants = [
+        ('By extension (today)', classify_by_extension),
+        ('SortingRules, extension map', SortingRules(SORTING_EXTENSIONS)),
+        ('SortingRules, all rules',
+         SortingRules(SORTING_EXTENSIONS, SORTING_PATTERNS)),
+        ('SortingRules, + magic bytes',
+         SortingRules(SORTING_EXTENSIONS, SORTING_PATTERNS,
+                      DEFAULT_MAGIC_BYTES)),
+        ('Rule by rule', classify_rule_by_rule()),
+    ]
+    print(f'Sorting files ({count:,} files):')
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for i, (name, classify) in enumerate(variants):
+            source = os.path.join(temp_dir, f'run{i}', 'Files')
+            generate_mixed_file_tree(source, count)
+            start = time.perf_counter()
+            sort_files(source, os.path.join(temp_dir, f'run{i}', 'Sorted'),
+                       classify=classify)
+            elapsed = time.perf_counter() - start
+            print(f'\t{name:<30} {count / elapsed:>12,.0f} files/sec')
+
+
+# --------------------------------------------------------------------------- #
+# IPv4 validation
+
+def generate_ipv4_addresses(rows, invalid_share=0.1, seed=1):
+    """
+    Generates IPv4 addresses, some of them invalid, like in access logs.
+    """
+    rd.seed(seed)
+    invalid = ['256.1.1.1', '10.0.0', 'localhost', '1.2.3.4.5', '10.0.0.x']
+    return [rd.choice(invalid) if rd.random() < invalid_share else
+            f'{rd.randrange(256)}.{rd.randrange(256)}.'
+            f'{rd.randrange(256)}.{rd.randrange(256)}'
+            for _ in range(rows)]
+
+
+def validate_ipv4_old(addresses):
+    """
+    The old way: split and isdigit() and int() per octet, as task 3A did.
+    """
+    results = []
+    for address in addresses:
+        parts = address.split('.')
+        valid = len(parts) == 4 and all(
+            part.isdigit() and 0 <= int(part) <= 255 for part in parts)
+        results.append(valid)
+    return results
+
+
+def benchmark_ipv4_validation(rows=1_000_000):
+    """
+    Compares validating addresses one at a time with parse_ipv4_batch.
+    """
+    addresses = generate_ipv4_addresses(rows)
+    before = rows_per_second(validate_ipv4_old, addresses)
+    after = rows_per_second(parse_ipv4_batch, addresses)
+    print_comparison(f'IPv4 validation ({rows:,} rows)', before, after)
+
+
+def generate_cidrs(count, seed=1):
+    """
+    Generates CIDR prefixes of length 8 to 32, some nested in others.
+    """
+    rd.seed(seed)
+    cidrs = []
+    for _ in range(count):
+        length = rd.randint(8, 32)
+        if cidrs and rd.random() < 0.3:
+            # A longer prefix inside an earlier one, like a subnet
+            network = parse_cidr(rd.choice(cidrs))[0] | rd.getrandbits(24)
+        else:
+            network = rd.getrandbits(32)
+        cidrs.append(f'{format_ipv4(network)}/{length}')
+    return cidrs
+
+
+def lookup_linear(prefixes, packed):
+    """
+    The naive way: scans every prefix for every address.
+    """
+    result = []
+    for value in packed:
+        best_length, best = -1, -1
+        for prefix_id, (network, length) in enumerate(prefixes):
+            matches = (value ^ network) >> (32 - length) == 0
+            if matches and length > best_length:
+                best_length, best = length, prefix_id
+        result.append(best)
+    return result
+
+
+def benchmark_cidr_lookup(prefix_count=100_000, rows=1_000_000):
+    """
+    Compares a linear scan of the prefixes per address with CidrIndex.
+    """
+    cidrs = generate_cidrs(prefix_count)
+    packed, _ = parse_ipv4_batch(generate_ipv4_addresses(rows,
+                                                         invalid_share=0))
+    start = time.perf_counter()
+    index = CidrIndex((cidr, cidr) for cidr in cidrs)
+    index.lookup_index(0)  # Builds the ranges
+    build_seconds = time.perf_counter() - start
+
+    # The linear scan is too slow for all rows, so it gets a sample.
+    prefixes = [parse_cidr(cidr) for cidr in cidrs]
+    before = rows_per_second(lambda rows: lookup_linear(prefixes, rows),
+                             packed[:50])
+    after = rows_per_second(index.lookup_batch, packed)
+    print_comparison(f'CIDR lookup ({prefix_count:,} prefixes, '
+                     f'{rows:,} rows)', before, after)
+    print(f'\tindex built in {build_seconds:.2f} s')
+
+
+# --------------------------------------------------------------------------- #
+# Colours
+
+def generate_pixels(count, palette_size=256, seed=1):
+    """
+    Generates packed RGB pixels using a limited palette, like an image.
+    """
+    rd.seed(seed)
+    palette = [bytes(rd.randrange(256) for _ in range(3))
+               for _ in range(palette_size)]
+    return b''.join(rd.choice(palette) for _ in range(count))
+
+
+def rgb_to_hex_one_by_one(colours):
+    """
+    The old way: task 3C (without its printing decorator) per colour.
+    """
+    from oppgave3 import rgb_to_hex
+    convert = getattr(rgb_to_hex, '__wrapped__', rgb_to_hex)
+    return [convert(r, g, b) for r, g, b in colours]
+
+
+def hex_to_rgb_with_int(hex_codes):
+    """
+    The plain way: int(..., 16) per component of every code.
+    """
+    return [(int(code[1:3], 16), int(code[3:5], 16), int(code[5:7], 16))
+            for code in hex_codes]
+
+
+def benchmark_colours(rows=1_000_000):
+    """
+    Compares task 3C per colour with the batch and pixel buffer functions
+    in colours, and int() with the cached hex_to_rgb.
+    """
+    pixels = generate_pixels(rows)
+    colours = list(zip(pixels[0::3], pixels[1::3], pixels[2::3]))
+    before = rows_per_second(rgb_to_hex_one_by_one, colours)
+    print_comparison(f'RGB to HEX, batch ({rows:,} rows)', before,
+                     rows_per_second(rgb_to_hex_batch, colours))
+    # The buffer has 3 bytes per row, and rows_per_second counts bytes.
+    print_comparison(f'RGB to HEX, pixel buffer ({rows:,} rows)', before,
+                     rows_per_second(pixels_to_hex, pixels) / 3)
+    hex_codes = pixels_to_hex(pixels)
+    hex_to_rgb.cache_clear()
+    print_comparison(f'HEX to RGB ({rows:,} rows)',
+                     rows_per_second(hex_to_rgb_with_int, hex_codes),
+                     rows_per_second(
+                         lambda codes: [hex_to_rgb(code) for code in codes],
+                         hex_codes))
+
+
+# --------------------------------------------------------------------------- #
+# Summation
+
+def sum_with_loop(n):
+    """
+    The old way: task 1A added the numbers 1 to n in a for loop.
+    """
+    total_sum = 0
+    for i in range(1, n + 1):
+        total_sum += i
+    return total_sum
+
+
+def benchmark_summation(max_exponent=12, max_loop_exponent=7):
+    """
+    Times the loop of task 1A and range_sum as n grows. range_sum takes
+    the same time for every n.
+    """
+    print('Summation (1 + 2 + ... + n):')
+    for exponent in range(3, max_exponent + 1, 3):
+        n = 10 ** exponent
+        start = time.perf_counter()
+        for _ in range(1000):
+            range_sum(1, n + 1)
+        closed_form = (time.perf_counter() - start) / 1000
+        loop = '-'
+        if exponent <= max_loop_exponent:
+            start = time.perf_counter()
+            sum_with_loop(n)
+            loop = f'{(time.perf_counter() - start) * 1e6:,.1f} µs'
+        print(f'\tn = 10^{exponent:<3} loop: {loop:>16}   '
+              f'range_sum: {closed_form * 1e6:.2f} µs')
+
+
+# --------------------------------------------------------------------------- #
+# Multiplication tables
+
+def print_tables_with_loop(numbers):
+    """
+    The old way: task 1C printed every line of a table on its own.
+    """
+    for number in numbers:
+        for i in range(1, 11):
+            print(f'{number} * {i}')
+
+
+def benchmark_multiplication_tables(count=200_000):
+    """
+    Compares the print loop of task 1C with write_tables, both writing
+    the tables of count numbers to os.devnull.
+    """
+    numbers = range(1, count + 1)
+    lines = count * 10
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        start = time.perf_counter()
+        print_tables_with_loop(numbers)
+        before = lines / (time.perf_counter() - start)
+    file_descriptor = os.open(os.devnull, os.O_WRONLY)
+    try:
+        start = time.perf_counter()
+        write_tables(file_descriptor, numbers)
+        after = lines / (time.perf_counter() - start)
+        start = time.perf_counter()
+        write_tables(file_descriptor, numbers, with_product=True)
+        with_product = lines / (time.perf_counter() - start)
+    finally:
+        os.close(file_descriptor)
+    print_comparison(f'Multiplication tables ({lines:,} lines)', before,
+                     after)
+    print(f'\twith product: {with_product:>9,.0f} rows/sec')
+
+
+# --------------------------------------------------------------------------- #
+# Suite
+
+def generate_names_and_ages(count, seed=1):
+    """
+    Generates unique names and ages, like the lists in task 2B.
+    """
+    rd.seed(seed)
+    names = [f'Name{i}' for i in range(count)]
+    rd.shuffle(names)
+    return names, [rd.randrange(1, 100) for _ in range(count)]
+
+
+def generate_file_tree(folder, count, seed=1):
+    """
+    Creates count empty files with random names and types in folder,
+    like the 'Files' folder of task 4A.
+    """
+    rd.seed(seed)
+    os.makedirs(folder, exist_ok=True)
+    extensions = ['txt', 'csv', 'log', 'jpg', 'pdf', '']
+    for i in range(count):
+        extension = rd.choice(extensions)
+        name = f'file{i}.{extension}' if extension else f'file{i}'
+        os.close(os.open(os.path.join(folder, name),
+                         os.O_CREAT | os.O_WRONLY))
+
+
+def quietly(func):
+    """
+    Returns func with its printing sent to os.devnull.
+    """
+    def run(*args):
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            return func(*args)
+    return run
+
+
+def suite_oppgave1(rows, repeat):
+    """
+    Tasks 1A-1D and 2A through the batch mode, one record per row.
+    """
+    import io
+    from batch_tasks import run_batch
+    rd.seed(1)
+    records = [{'task': '1a', 'number': rd.randint(1, 10**12)}
+               if i % 4 == 0 else
+               {'task': '1c', 'number': rd.randint(1, 100)} if i % 4 == 1 else
+               {'task': '1d', 'index_1': rd.randrange(5),
+                'index_2': rd.randrange(5)} if i % 4 == 2 else
+               {'task': '2a', 'date_str': date_str}
+               for i, date_str in enumerate(generate_loan_dates(rows))]
+    return [measure('batch_tasks.run_batch',
+                    lambda data: run_batch(data, io.StringIO()), records,
+                    repeat=repeat)]
+
+
+def suite_oppgave2(rows, repeat):
+    """
+    Tasks 2C-2E on name/age lists.
+    """
+    from oppgave2 import task_2c, task_2d, task_2e
+    names, ages = generate_names_and_ages(rows)
+    name_age_dict = dict(zip(names, ages))
+    return [
+        measure('oppgave2.task_2c', quietly(lambda data: task_2c(*data)),
+                (names, ages), rows, repeat=repeat),
+        measure('oppgave2.task_2d', quietly(task_2d), name_age_dict,
+                repeat=repeat),
+        measure('oppgave2.task_2e', quietly(task_2e), name_age_dict,
+                repeat=repeat),
+    ]
+
+
+def suite_oppgave3(rows, repeat):
+    """
+    Tasks 3A-3C per call, and the batch functions, on address, date and
+    colour corpora.
+    """
+    from oppgave3 import rgb_to_hex, task_3a, task_3b
+    addresses = generate_ipv4_addresses(rows)
+    pairs = list(zip(generate_loan_dates(rows, seed=1),
+                     generate_loan_dates(rows, seed=2)))
+    pixels = generate_pixels(rows)
+    colours = list(zip(pixels[0::3], pixels[1::3], pixels[2::3]))
+    return [
+        measure('oppgave3.task_3a',
+                lambda data: [task_3a(address) for address in data],
+                addresses, repeat=repeat),
+        measure('ipv4.parse_ipv4_batch', parse_ipv4_batch, addresses,
+                repeat=repeat),
+        measure('oppgave3.task_3b',
+                lambda data: [task_3b(*pair) for pair in data],
+                pairs, repeat=repeat),
+        measure('date_parsing.date_differences', date_differences, pairs,
+                repeat=repeat),
+        measure('oppgave3.rgb_to_hex',
+                lambda data: [rgb_to_hex(*colour) for colour in data],
+                colours, repeat=repeat),
+        measure('colours.rgb_to_hex_batch', rgb_to_hex_batch, colours,
+                repeat=repeat),
+        measure('colours.pixels_to_hex', pixels_to_hex, pixels, rows,
+                repeat=repeat),
+    ]
+
+
+def suite_oppgave4(rows, repeat):
+    """
+    Task 4A and 4B on file trees, with at most 100,000 files.
+    """
+    # oppgave4 changes the working directory to its own folder on import.
+    cwd = os.getcwd()
+    try:
+        from oppgave4 import create_random_files
+    finally:
+        os.chdir(cwd)
+
+    count = min(rows, 100_000)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        runs = iter(range(repeat + 1))
+
+        def new_folder():
+            return os.path.join(temp_dir, f'run{next(runs)}')
+
+        def new_tree():
+            folder = new_folder()
+            generate_file_tree(os.path.join(folder, 'Files'), count)
+            return folder
+
+        results = [
+            measure('oppgave4.create_random_files',
+                    lambda folder: create_random_files(
+                        count, os.path.join(folder, 'Files')),
+                    rows=count, setup=new_folder, repeat=repeat),
+        ]
+        runs = iter(range(repeat + 1))
+        results.append(measure(
+            'file_sorter.sort_files',
+            lambda folder: sort_files(os.path.join(folder, 'Files'),
+                                      os.path.join(folder, 'SortedFiles')),
+            rows=count, setup=new_tree, repeat=repeat))
+    return results
+
+
+def suite_oppgave5(rows, repeat):
+    """
+    Reading a loan CSV with malformed rows into objects and into a table,
+    and running the reports of tasks 5A-5E.
+    """
+    from loans import CsvErrorSink, LoanTable, create_task_report_engine
+    from oppgave5 import create_class_list_from_csv
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filename = os.path.join(temp_dir, 'bokutlån.csv')
+        error_file = os.path.join(temp_dir, 'errors_from_csv.txt')
+        write_loan_csv(filename, rows)
+
+        def load_table(name):
+            with CsvErrorSink(error_file) as error_sink:
+                return LoanTable.from_csv(name, error_sink)
+
+        def run_reports(name):
+            with CsvErrorSink(error_file) as error_sink:
+                return create_task_report_engine(
+                    error_sink=error_sink).run(name)
+
+        return [
+            measure('oppgave5.create_class_list_from_csv',
+                    quietly(lambda name: create_class_list_from_csv(
+                        name, CsvErrorSink(error_file))),
+                    filename, rows, repeat=repeat),
+            measure('loans.LoanTable.from_csv', load_table, filename,
+                    rows, repeat=repeat),
+            measure('loans.reports', run_reports, filename, rows,
+                    repeat=repeat),
+        ]
+
+
+SUITE = {
+    'oppgave1': suite_oppgave1,
+    'oppgave2': suite_oppgave2,
+    'oppgave3': suite_oppgave3,
+    'oppgave4': suite_oppgave4,
+    'oppgave5': suite_oppgave5,
+}
+
+
+def run_suite(modules, rows, repeat=3, output=None):
+    """
+    Runs the suite for the given modules, prints the results and writes
+    them as JSON to output, if given.
+    """
+    # The task decorators would print on every call.
+    from instrumentation import set_mode
+    set_mode('off')
+
+    results = []
+    print(f'{"Case":<40} {"rows/sec":>14} {"peak MB":>9} {"min ms":>9} '
+          f'{"median ms":>10}')
+    for module in modules or SUITE:
+        for result in SUITE[module](rows, repeat):
+            results.append(result)
+            print(f'{result["case"]:<40} {result["rows_per_sec"]:>14,.0f} '
+                  f'{result["peak_memory_bytes"] / 2**20:>9.1f} '
+                  f'{result["min_ms"]:>9.1f} {result["median_ms"]:>10.1f}')
+    if output:
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump({'rows': rows, 'repeat': repeat,
+                       'python': platform.python_version(),
+                       'results': results}, file, indent=2)
+        print(f'Results written to: {output}')
+    return results
+
+
+def compare_results(old_file, new_file, threshold=0.1):
+    """
+    Compares two suite result files. A case is a regression when its
+    throughput drops, or its peak memory grows, by more than threshold.
+
+    Returns:
+        list[str]: The cases with regressions.
+    """
+    with open(old_file, encoding='utf-8') as file:
+        old_results = {result['case']: result
+                       for result in json.load(file)['results']}
+    with open(new_file, encoding='utf-8') as file:
+        new_results = json.load(file)['results']
+
+    regressions = []
+    print(f'{"Case":<40} {"throughput":>11} {"memory":>9}')
+    for new in new_results:
+        old = old_results.get(new['case'])
+        if old is None:
+            print(f'{new["case"]:<40} {"new":>11}')
+            continue
+        speed = new['rows_per_sec'] / old['rows_per_sec'] - 1
+        memory = (new['peak_memory_bytes'] / old['peak_memory_bytes'] - 1
+                  if old['peak_memory_bytes'] else 0.0)
+        regressed = speed < -threshold or memory > threshold
+        if regressed:
+            regressions.append(new['case'])
+        print(f'{new["case"]:<40} {speed:>+11.1%} {memory:>+9.1%}'
+              f'{"  REGRESSION" if regressed else ""}')
+    return regressions
+
+
+# --------------------------------------------------------------------------- #
+# Main
+
+BENCHMARKS = {
+    'date_parsing': benchmark_date_parsing,
+    'date_differences': benchmark_date_differences,
+    'loan_records': benchmark_loan_records,
+    'file_classification': benchmark_file_classification,
+    'ipv4_validation': benchmark_ipv4_validation,
+    'cidr_lookup': benchmark_cidr_lookup,
+    'colours': benchmark_colours,
+    'summation': benchmark_summation,
+    'multiplication_tables': benchmark_multiplication_tables,
+}
+
+
+def main():
+    """
+    Runs the command given on the command line. Without a command, runs
+    all the speedup benchmarks.
+    """
+    parser = argparse.ArgumentParser(description='Benchmarks for the tasks.')
+    commands = parser.add_subparsers(dest='command')
+    parser.set_defaults(command='speedups', names=[])
+
+    speedups = commands.add_parser('speedups', help='old vs new speedups')
+    speedups.add_argument('names', nargs='*', help=', '.join(BENCHMARKS))
+
+    suite = commands.add_parser('suite', help='measure the task modules')
+    suite.add_argument('modules', nargs='*', help=', '.join(SUITE))
+    suite.add_argument('--rows', type=int, default=100_000)
+    suite.add_argument('--repeat', type=int, default=3)
+    suite.add_argument('--output', help='JSON file for the results')
+
+    compare = commands.add_parser('compare', help='compare suite results')
+    compare.add_argument('old')
+    compare.add_argument('new')
+    compare.add_argument('--threshold', type=float, default=0.1)
+
+    args = parser.parse_args()
+    names = getattr(args, 'names', None) or getattr(args, 'modules', None)
+    known = BENCHMARKS if args.command == 'speedups' else SUITE
+    for name in names or ():
+        if name not in known:
+            parser.error(f'unknown name: {name} '
+                         f'(choose from {", ".join(known)})')
+
+    if args.command == 'speedups':
+        for name in args.names or BENCHMARKS:
+            BENCHMARKS[name]()
+    elif args.command == 'suite':
+        run_suite(args.modules, args.rows, args.repeat, args.output)
+    elif compare_results(args.old, args.new, args.threshold):
+        sys.exit(1)
+
+
+# --------------------------------------------------------------------------- #
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+from functools import lru_cache
+
+# --------------------------------------------------------------------------- #
+"""
+Conversion between RGB values and HEX colour codes ('#CD5C5C').
+
+Used by task 3C, and for converting whole palettes and pixel buffers
+without the task decorator printing on every call. Every byte value has
+its two HEX digits precomputed, so a colour is formatted with three table
+lookups. Pixel buffers are read through memoryview, without copying.
+"""
+
+# The two HEX digits of every byte value, by value.
+HEX_BYTES = tuple(f'{value:02X}' for value in range(256))
+# The byte value of every pair of HEX digits, in upper and lower case.
+HEX_VALUES = {digits: value for value in range(256)
+              for digits in {HEX_BYTES[value], HEX_BYTES[value].lower()}}
+
+COLOUR_CACHE_SIZE = 4096
+
+
+# --------------------------------------------------------------------------- #
+# Single colours
+
+def rgb_to_hex(r: int, g: int, b: int) -> str:
+    """
+    Converts RGB values to a HEX colour code.
+
+    Args:
+        r (int): Red (0-255).
+        g (int): Green (0-255).
+        b (int): Blue (0-255).
+    Returns:
+        str: The HEX colour code, like '#CD5C5C'.
+    Raises:
+        ValueError: If a value is not an integer between 0 and 255.
+    """
+    try:
+        # The range check also stops negative values indexing from the end.
+        if 0 <= r <= 255 and 0 <= g <= 255 and 0 <= b <= 255:
+            return '#' + HEX_BYTES[r] + HEX_BYTES[g] + HEX_BYTES[b]
+    except TypeError:
+        pass
+    raise ValueError(f'RGB values must be integers between 0-255: {(r, g, b)}')
+
+
+@lru_cache(maxsize=COLOUR_CACHE_SIZE)
+def hex_to_rgb(hex_code: str) -> tuple[int, int, int]:
+    """
+    Converts a HEX colour code to RGB values. The '#' is optional, and
+    the digits can be upper or lower case. Colours repeat a lot in
+    palettes, so results are cached.
+
+    Args:
+        hex_code (str): The HEX colour code, like '#CD5C5C'.
+    Returns:
+        tuple[int, int, int]: The red, green and blue values.
+    Raises:
+        ValueError: If the code is not six HEX digits.
+    """
+    digits = hex_code[1:] if hex_code.startswith('#') else hex_code
+    try:
+        if len(digits) == 6:
+            return (HEX_VALUES[digits[0:2]], HEX_VALUES[digits[2:4]],
+                    HEX_VALUES[digits[4:6]])
+    except KeyError:
+        pass
+    raise ValueError(f'Invalid HEX colour code: {hex_code!r}')
+
+
+# --------------------------------------------------------------------------- #
+# Batches
+
+def rgb_to_hex_batch(colours):
+    """
+    Converts many (r, g, b) triples to HEX colour codes.
+
+    Raises:
+        ValueError: If a value is not an integer between 0 and 255.
+    """
+    return [rgb_to_hex(r, g, b) for r, g, b in colours]
+
+
+def hex_to_rgb_batch(hex_codes):
+    """
+    Converts many HEX colour codes to (r, g, b) triples.
+
+    Raises:
+        ValueError: If a code is not six HEX digits.
+    """
+    return [hex_to_rgb(hex_code) for hex_code in hex_codes]
+
+
+def pixels_to_hex(pixels):
+    """
+    Converts packed RGB pixels (3 bytes per pixel) to HEX colour codes.
+
+    Args:
+        pixels (bytes | bytearray | memoryview): The pixels. The buffer is
+            not copied.
+    Returns:
+        list[str]: The HEX colour code of every pixel.
+    Raises:
+        ValueError: If the length is not a multiple of 3.
+    """
+    view = memoryview(pixels).cast('B')
+    if len(view) % 3:
+        raise ValueError('Packed RGB pixels must be 3 bytes each')
+    table = HEX_BYTES
+    return ['#' + table[r] + table[g] + table[b]
+            for r, g, b in zip(view[0::3], view[1::3], view[2::3])]
+
+
+def hex_to_pixels(hex_codes):
+    """
+    Converts HEX colour codes to packed RGB pixels, the reverse of
+    pixels_to_hex.
+
+    Returns:
+        bytearray: 3 bytes per colour.
+    Raises:
+        ValueError: If a code is not six HEX digits.
+    """
+    pixels = bytearray()
+    extend = pixels.extend
+    for hex_code in hex_codes:
+        extend(hex_to_rgb(hex_code))
+    return pixels
@@ -0,0 +1,142 @@
+from array import array
+import csv
+from datetime import date, datetime
+from functools import lru_cache
+
+# --------------------------------------------------------------------------- #
+"""
+Shared parsing of dates in the format "dd/mm/yyyy".
+
+Used by task 2A, task 3B and the loan data in loans (task 5).
+datetime.strptime is slow, so dates in the exact format "dd/mm/yyyy" are
+sliced and range checked by hand. Everything else (like "1/2/2024") falls
+back to strptime, so the same strings are accepted and rejected as before.
+Loan dates repeat a lot, so parsed dates are cached on the raw string.
+
+date_differences computes the days between many pairs of dates, like
+task 3B, into an array of ints for reports over large files.
+"""
+
+DATE_FORMAT = '%d/%m/%Y'
+DATE_CACHE_SIZE = 4096
+
+
+# --------------------------------------------------------------------------- #
+# Parsing
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date(date_str: str) -> date:
+    """
+    Parses a date in the format "dd/mm/yyyy".
+
+    Args:
+        date_str (str): The date to parse.
+    Returns:
+        date: The parsed date.
+    Raises:
+        ValueError: If the date is invalid or in the wrong format.
+    """
+    if (len(date_str) == 10 and date_str[2] == '/' and date_str[5] == '/'
+            and date_str.isascii()):
+        day, month, year = date_str[:2], date_str[3:5], date_str[6:]
+        if day.isdigit() and month.isdigit() and year.isdigit():
+            # date() does the range check, including leap years.
+            return date(int(year), int(month), int(day))
+    return datetime.strptime(date_str, DATE_FORMAT).date()
+
+
+def parse_date_ordinal(date_str: str) -> int:
+    """
+    Parses a date in the format "dd/mm/yyyy" and returns its day ordinal.
+    Raises ValueError the same way as parse_date.
+    """
+    return parse_date(date_str).toordinal()
+
+
+def is_valid_date(date_str: str) -> bool:
+    """
+    Checks if a string is a valid date in the format "dd/mm/yyyy".
+    """
+    try:
+        parse_date(date_str)
+        return True
+    except ValueError:
+        return False
+
+
+# --------------------------------------------------------------------------- #
+# Date differences
+
+def days_between(date_1: str, date_2: str) -> int:
+    """
+    Returns the number of days between two dates in the format
+    "dd/mm/yyyy", always positive. Raises ValueError like parse_date.
+    """
+    return abs(parse_date_ordinal(date_1) - parse_date_ordinal(date_2))
+
+
+def date_differences(pairs, absolute=True):
+    """
+    Computes the days between many pairs of dates.
+
+    Every date string is converted to a day ordinal once per call, so
+    dates repeating across the pairs cost one dict lookup.
+
+    Args:
+        pairs (Iterable[Sequence[str]]): Pairs of dates "dd/mm/yyyy", like
+            rows from csv.reader. Extra items in a pair are ignored.
+        absolute (bool): Returns positive day counts, like task 3B. If
+            False, the count is negative when the first date is later.
+    Returns:
+        tuple[array, list[int]]: array('l') with the days of every pair,
+        0 for invalid pairs, and the indexes of the invalid pairs.
+    """
+    days = array('l')
+    invalid = []
+    ordinals = {}
+    append = days.append
+    for index, pair in enumerate(pairs):
+        try:
+            first, second = pair[0], pair[1]
+            ordinal_1 = ordinals.get(first)
+            if ordinal_1 is None:
+                ordinal_1 = ordinals[first] = parse_date_ordinal(first)
+            ordinal_2 = ordinals.get(second)
+            if ordinal_2 is None:
+                ordinal_2 = ordinals[second] = parse_date_ordinal(second)
+        except (ValueError, IndexError, TypeError):
+            invalid.append(index)
+            append(0)
+            continue
+        difference = ordinal_2 - ordinal_1
+        append(abs(difference) if absolute else difference)
+    return days, invalid
+
+
+def date_differences_from_csv(file, columns=(0, 1), has_header=False,
+                              absolute=True, delimiter=','):
+    """
+    Computes the days between two date columns of a CSV stream.
+
+    Args:
+        file (str | TextIO): Filename or open text file of the CSV.
+        columns (tuple[int, int]): The indexes of the two date columns.
+        has_header (bool): Skips the first line. Row indexes count from
+            the first row after it.
+        absolute (bool): See date_differences.
+        delimiter (str): The CSV delimiter.
+    Returns:
+        tuple[array, list[int]]: See date_differences.
+    """
+    if isinstance(file, str):
+        with open(file, encoding='utf-8', newline='') as csv_file:
+            return date_differences_from_csv(csv_file, columns, has_header,
+                                             absolute, delimiter)
+    rows = csv.reader(file, delimiter=delimiter)
+    if has_header:
+        next(rows, None)
+    first, second = columns
+    if columns != (0, 1):
+        rows = ((row[first], row[second]) if len(row) > max(columns) else ()
+                for row in rows)
+    return date_differences(rows, absolute)
@@ -0,0 +1,738 @@
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import fnmatch
+import json
+import os
+import re
+import threading
+import time
+
+# --------------------------------------------------------------------------- #
+"""
+Sorter engine for task 4B.
+
+Moves the files in a folder into sub folders of a sorted folder, named by
+file type ('<ext>-files'). The folder is read with a single os.scandir
+pass, every target folder is created and listed once, and the renames are
+done in batches by a pool of threads.
+
+SortingWatcher runs the sorter as a long-running watch mode, moving new
+files shortly after they arrive. SortingRules replaces the classification
+by extension with configurable rules. MoveJournal logs the moves of a sort,
+so an interrupted sort can be resumed or rolled back.
+"""
+
+
+# --------------------------------------------------------------------------- #
+# Utility
+
+def classify_by_extension(entry):
+    """
+    Returns the file type of a file (os.DirEntry) from its extension,
+    without the dot ('' if it has none).
+    """
+    return os.path.splitext(entry.name)[1].lstrip('.')
+
+
+def target_folder_name(file_type):
+    """
+    Returns the name of the sub folder for a file type.
+    """
+    return f'{file_type}-files'
+
+
+def scan_files(folder):
+    """
+    Returns the files in a folder as os.DirEntry objects, in the same
+    order as os.listdir. Uses the file type cached by os.scandir.
+    """
+    with os.scandir(folder) as entries:
+        return [entry for entry in entries if entry.is_file()]
+
+
+def rename_files(moves):
+    """
+    Renames (source, destination) pairs. Used by the threads in sort_files.
+    """
+    for source, destination in moves:
+        os.rename(source, destination)
+
+
+def is_empty_folder(folder):
+    """
+    Checks if a folder is empty without listing all of it.
+    """
+    with os.scandir(folder) as entries:
+        return next(entries, None) is None
+
+
+# --------------------------------------------------------------------------- #
+# Sorter
+
+def plan_moves(files, sorted_folder, classify=classify_by_extension,
+               existing_by_folder=None):
+    """
+    Decides where every file goes.
+
+    Every target folder is created and listed once, so files that already
+    exist there are found without a check per file.
+
+    Args:
+        files (list[os.DirEntry]): The files to sort.
+        sorted_folder (str): The folder holding the sub folders.
+        classify (Callable[[os.DirEntry], str]): Returns the file type
+            of a file, like classify_by_extension or SortingRules.
+        existing_by_folder (dict[str, set[str]], optional): Files in every
+            target folder from an earlier call, kept up to date with the
+            planned moves.
+    Returns:
+        tuple[list[tuple[str, str]], dict[str, int], dict[str, int]]:
+            (source, destination) pairs, and the files moved and already
+            existing per file type, in the order the types were found.
+    """
+    if existing_by_folder is None:
+        existing_by_folder = {}
+    moves = []
+    files_moved = {}
+    files_existed = {}
+    for entry in files:
+        file_type = classify(entry)
+        target = os.path.join(sorted_folder, target_folder_name(file_type))
+        existing = existing_by_folder.get(target)
+        if existing is None:
+            os.makedirs(target, exist_ok=True)
+            existing = existing_by_folder[target] = set(os.listdir(target))
+
+        if entry.name in existing:
+            files_existed[file_type] = files_existed.get(file_type, 0) + 1
+        else:
+            existing.add(entry.name)
+            moves.append((entry.path, os.path.join(target, entry.name)))
+            files_moved[file_type] = files_moved.get(file_type, 0) + 1
+    return moves, files_moved, files_existed
+
+
+def sort_files(source_folder='Files', sorted_folder='SortedFiles',
+               workers=None, batch_size=1000,
+               classify=classify_by_extension, journal_path=None):
+    """
+    Moves the files in source_folder into sub folders of sorted_folder by
+    file type.
+
+    Args:
+        source_folder (str): The folder with the files to sort.
+        sorted_folder (str): The folder holding the '<ext>-files' folders.
+        workers (int, optional): Number of threads doing the renames.
+        batch_size (int): Renames per task given to a thread.
+        classify (Callable[[os.DirEntry], str]): Returns the file type of
+            a file. Defaults to the extension.
+        journal_path (str, optional): Logs the moves to a MoveJournal at
+            this path, replacing any earlier journal there.
+    Returns:
+        tuple[dict[str, int], dict[str, int]]: Files moved and files
+        already existing in the target folder, per file type.
+    """
+    moves, files_moved, files_existed = plan_moves(
+        scan_files(source_folder), sorted_folder, classify)
+    if journal_path is None:
+        run_moves(moves, workers, batch_size)
+    else:
+        journal = MoveJournal(journal_path)
+        journal.start(moves)
+        run_journaled_moves(journal, range(len(moves)), workers, batch_size)
+    return files_moved, files_existed
+
+
+def run_moves(moves, workers=None, batch_size=1000):
+    """
+    Renames (source, destination) pairs in batches on a pool of threads.
+    Small lists are renamed directly.
+    """
+    if len(moves) <= batch_size:
+        rename_files(moves)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(rename_files, moves[i:i + batch_size])
+                   for i in range(0, len(moves), batch_size)]
+        for future in futures:
+            future.result()
+
+
+# --------------------------------------------------------------------------- #
+# Move journal
+
+class MoveJournal:
+    """
+    Append-only log of the moves of one sort, written ahead of the moves.
+
+    The journal is a file of JSON lines:
+        ["move", source, destination]  for every planned move, synced once
+                                        before any file is moved.
+        ["planned", count]             after the last planned move. A plan
+                                        without it was cut off before any
+                                        file was moved.
+        ["failed", index, error]       for a move that could not be done,
+                                        logged with the batch it was in.
+        ["done", first, stop]          when the moves with plan index
+                                        first..stop-1 are done, synced once
+                                        per batch, not per file. Failed
+                                        moves in the range are not done.
+        ["complete"]                   when every move is done or failed.
+    A sort that stops before "complete" can be resumed with resume_moves,
+    and any sort in the journal can be undone with rollback_moves. Neither
+    rescans the folders: only the moves not logged as done are checked.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.moves = []
+        self.planned = None  # Number of moves in the "planned" record
+        self.done = bytearray()  # 1 for every move logged as done
+        self.failed = {}  # Error of every failed move, by plan index
+        self.complete = False
+        self._file = None
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a journal. A last line cut short by a crash is cut off the
+        file, so later lines are not appended to it.
+        """
+        journal = cls(path)
+        valid_end = 0
+        with open(path, 'rb') as file:
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    break
+                valid_end += len(line)
+                if record[0] == 'move':
+                    journal.moves.append((record[1], record[2]))
+                elif record[0] == 'planned':
+                    journal.planned = record[1]
+                elif record[0] == 'done':
+                    journal.done.extend(
+                        bytes(len(journal.moves) - len(journal.done)))
+                    journal.done[record[1]:record[2]] = (
+                        b'\x01' * (record[2] - record[1]))
+                elif record[0] == 'failed':
+                    journal.failed[record[1]] = record[2]
+                elif record[0] == 'complete':
+                    journal.complete = True
+        journal.done.extend(bytes(len(journal.moves) - len(journal.done)))
+        for index in journal.failed:
+            journal.done[index] = 0
+        if valid_end < os.path.getsize(path):
+            os.truncate(path, valid_end)
+        return journal
+
+    @property
+    def fully_planned(self):
+        """
+        True if the whole plan was written before any file was moved.
+        """
+        return self.planned == len(self.moves)
+
+    def _write(self, lines):
+        """
+        Appends lines to the journal and syncs them to disk.
+        """
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(''.join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def start(self, moves):
+        """
+        Replaces the journal with a new list of planned moves.
+        """
+        self.close()
+        open(self.path, 'w').close()
+        self.moves = list(moves)
+        self.done = bytearray(len(self.moves))
+        self.failed = {}
+        self.complete = False
+        self.planned = len(self.moves)
+        lines = [json.dumps(['move', source, destination]) + '\n'
+                 for source, destination in self.moves]
+        lines.append(json.dumps(['planned', self.planned]) + '\n')
+        self._write(lines)
+
+    def mark_done(self, first, stop, failures=()):
+        """
+        Logs the moves with plan index first..stop-1 as done, except the
+        (index, error) pairs in failures, which are logged as failed.
+        """
+        self.done[first:stop] = b'\x01' * (stop - first)
+        lines = []
+        for index, error in failures:
+            self.done[index] = 0
+            self.failed[index] = error
+            lines.append(json.dumps(['failed', index, error]) + '\n')
+        lines.append(json.dumps(['done', first, stop]) + '\n')
+        self._write(lines)
+
+    def mark_complete(self):
+        """
+        Logs that every move is done, and closes the journal.
+        """
+        self.complete = True
+        self._write(['["complete"]\n'])
+        self.close()
+
+    def pending(self):
+        """
+        Returns the plan indexes of the moves not done yet.
+
+        Moves of a batch that was cut off are not logged as done, so those
+        are checked on disk: a move whose source is gone and whose
+        destination exists is counted as done. A move whose source is gone
+        and whose destination is missing can't be done, so it is left out.
+        Failed moves are left out too.
+        """
+        pending = []
+        for index, (source, destination) in enumerate(self.moves):
+            if self.done[index] or index in self.failed:
+                continue
+            if os.path.exists(source):
+                pending.append(index)
+            elif os.path.exists(destination):
+                self.done[index] = 1
+        return pending
+
+    def close(self):
+        """
+        Closes the journal file, if open.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def index_batches(indexes, batch_size):
+    """
+    Splits sorted plan indexes into (first, stop) ranges of consecutive
+    indexes, at most batch_size long.
+    """
+    first = stop = None
+    for index in indexes:
+        if index == stop and stop - first < batch_size:
+            stop += 1
+            continue
+        if first is not None:
+            yield first, stop
+        first, stop = index, index + 1
+    if first is not None:
+        yield first, stop
+
+
+def rename_batch_safely(moves, first, stop):
+    """
+    Renames the moves with plan index first..stop-1, never over an
+    existing file. A move that fails doesn't stop the others.
+
+    Returns:
+        list[tuple[int, str]]: (plan index, error) of every failed move.
+    """
+    failures = []
+    for index in range(first, stop):
+        source, destination = moves[index]
+        try:
+            if os.path.exists(destination):
+                raise FileExistsError(f'Destination exists: {destination}')
+            os.rename(source, destination)
+        except OSError as e:
+            failures.append((index, f'{type(e).__name__}: {e}'))
+    return failures
+
+
+def run_journaled_moves(journal, indexes, workers=None, batch_size=1000):
+    """
+    Does the journal's moves with the given plan indexes, on a pool of
+    threads like run_moves, logging each batch as done when it finishes.
+    Moves that fail are logged as failed, and the rest go on. The journal
+    is marked complete when all moves are done or failed.
+
+    Returns:
+        list[tuple[int, str]]: (plan index, error) of every failed move.
+    """
+    moves = journal.moves
+    batches = list(index_batches(indexes, batch_size))
+    failures = []
+    if len(batches) <= 1:
+        for first, stop in batches:
+            batch_failures = rename_batch_safely(moves, first, stop)
+            journal.mark_done(first, stop, batch_failures)
+            failures.extend(batch_failures)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(rename_batch_safely, moves, first,
+                                       stop): (first, stop)
+                       for first, stop in batches}
+            for future in as_completed(futures):
+                batch_failures = future.result()
+                journal.mark_done(*futures[future], batch_failures)
+                failures.extend(batch_failures)
+    journal.mark_complete()
+    return failures
+
+
+def resume_moves(journal_path, workers=None, batch_size=1000):
+    """
+    Finishes a sort that was interrupted, from its journal. Moves that
+    can't be done are logged as failed in the journal. A journal whose
+    plan was cut off is removed, since no file was moved from it, and the
+    next sort plans the moves again.
+
+    Returns:
+        int: Number of files moved.
+    """
+    journal = MoveJournal.load(journal_path)
+    if journal.complete:
+        return 0
+    if not journal.fully_planned:
+        os.remove(journal_path)
+        return 0
+    pending = journal.pending()
+    failures = run_journaled_moves(journal, pending, workers, batch_size)
+    return len(pending) - len(failures)
+
+
+def rollback_moves(journal_path):
+    """
+    Moves the files of the sort in a journal back where they came from,
+    newest move first, and removes the journal. Safe to run again if it
+    is interrupted itself.
+
+    Returns:
+        int: Number of files moved back.
+    """
+    journal = MoveJournal.load(journal_path)
+    if not journal.fully_planned:
+        os.remove(journal_path)  # Cut off before any file was moved
+        return 0
+    journal.pending()  # Finds the moves done in a batch that was cut off
+    moved_back = 0
+    for index in range(len(journal.moves) - 1, -1, -1):
+        source, destination = journal.moves[index]
+        if (journal.done[index] and os.path.exists(destination)
+                and not os.path.exists(source)):
+            os.makedirs(os.path.dirname(source) or '.', exist_ok=True)
+            os.rename(destination, source)
+            moved_back += 1
+    os.remove(journal_path)
+    return moved_back
+
+
+# --------------------------------------------------------------------------- #
+# Sorting rules
+
+EXTENSION_CACHE_SIZE = 4096  # Distinct extensions remembered by SortingRules
+
+# Magic bytes at the start of some common file types.
+DEFAULT_MAGIC_BYTES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'%PDF-', 'pdf'),
+    (b'PK\x03\x04', 'zip'),
+    (b'\x1f\x8b', 'gz'),
+    (b'\x7fELF', 'elf'),
+)
+
+
+class SortingRules:
+    """
+    Classifies files by configurable rules, for use as "classify" in
+    sort_files, plan_moves and SortingWatcher.
+
+    The rules are tried in this order, and the first match decides:
+        1. Patterns: glob or regex rules on the filename. All patterns are
+           compiled into one regex, so a name is matched once, not once
+           per rule.
+        2. Extension map: a dict lookup on the extension, cached per
+           extension as it is written.
+        3. Magic bytes: the start of the file, read into a shared buffer.
+           Only files whose extension is not in the map, or is one of the
+           "ambiguous_extensions", are opened.
+        4. Size buckets and 5. age buckets, from the cached os.DirEntry
+           stat.
+        6. The extension, the same as classify_by_extension.
+
+    Args:
+        extension_map (dict[str, str]): Extension (without dot) to type.
+        patterns (Iterable[tuple[str, str]]): (pattern, type) pairs.
+            Patterns are globs, or regexes when prefixed with "re:".
+            Regexes must match the whole name and can't use numbered
+            groups.
+        magic_bytes (Iterable[tuple[bytes, str]] | None): (prefix, type)
+            pairs, or None to not read the files. Use DEFAULT_MAGIC_BYTES
+            for common types.
+        size_buckets (Iterable[tuple[int, str]]): (max size in bytes, type)
+            pairs. A file goes in the first bucket it is not larger than.
+        age_buckets (Iterable[tuple[float, str]]): (max age in seconds,
+            type) pairs, by modification time.
+        ignore_case (bool): Match patterns and extensions ignoring case.
+        ambiguous_extensions (Iterable[str]): Extensions whose files are
+            sniffed for magic bytes even when they are in the map, like
+            'bin' or 'dat'.
+    """
+
+    def __init__(self, extension_map=None, patterns=(), magic_bytes=None,
+                 size_buckets=(), age_buckets=(), ignore_case=True,
+                 ambiguous_extensions=()):
+        self.ignore_case = ignore_case
+        self.extension_map = {
+            self._normalize(extension): file_type
+            for extension, file_type in (extension_map or {}).items()}
+        self.ambiguous_extensions = {
+            self._normalize(extension) for extension in ambiguous_extensions}
+        # Type from the map (or None) by extension as written in the name.
+        self._extension_types = {}
+
+        self.pattern_types = []
+        regexes = []
+        for i, (pattern, file_type) in enumerate(patterns):
+            if pattern.startswith('re:'):
+                regex = pattern[3:]
+            else:
+                regex = fnmatch.translate(pattern)
+            regexes.append(f'(?P<rule{i}>{regex})')
+            self.pattern_types.append(file_type)
+        self.pattern_regex = re.compile(
+            '|'.join(regexes), re.IGNORECASE if ignore_case else 0
+        ) if regexes else None
+
+        self.magic_bytes = list(magic_bytes or ())
+        self._magic_buffer = bytearray(
+            max((len(prefix) for prefix, _ in self.magic_bytes), default=0))
+
+        size_buckets = sorted(size_buckets)
+        self._size_limits = [limit for limit, _ in size_buckets]
+        self._size_types = [file_type for _, file_type in size_buckets]
+        age_buckets = sorted(age_buckets)
+        self._age_limits = [limit for limit, _ in age_buckets]
+        self._age_types = [file_type for _, file_type in age_buckets]
+
+    def _normalize(self, extension):
+        """
+        Returns an extension without the dot, lowercased if ignoring case.
+        """
+        extension = extension.lstrip('.')
+        return extension.lower() if self.ignore_case else extension
+
+    def _map_extension(self, extension):
+        """
+        Looks an extension up in the map and caches the result. Returns
+        None for extensions to sniff first.
+        """
+        key = self._normalize(extension)
+        if self.magic_bytes and key in self.ambiguous_extensions:
+            file_type = None
+        else:
+            file_type = self.extension_map.get(key)
+        if len(self._extension_types) < EXTENSION_CACHE_SIZE:
+            self._extension_types[extension] = file_type
+        return file_type
+
+    def _sniff(self, path):
+        """
+        Returns the type from the magic bytes of a file, or None.
+        """
+        try:
+            with open(path, 'rb', buffering=0) as file:
+                length = file.readinto(self._magic_buffer)
+        except OSError:
+            return None
+        start = memoryview(self._magic_buffer)[:length]
+        for prefix, file_type in self.magic_bytes:
+            if start[:len(prefix)] == prefix:
+                return file_type
+        return None
+
+    @staticmethod
+    def _bucket(limits, types, value):
+        """
+        Returns the type of the first bucket "value" fits in, or None.
+        """
+        index = bisect_left(limits, value)
+        return types[index] if index < len(types) else None
+
+    def __call__(self, entry):
+        """
+        Returns the file type of a file (os.DirEntry).
+        """
+        name = entry.name
+        if self.pattern_regex is not None:
+            match = self.pattern_regex.fullmatch(name)
+            if match is not None:
+                return self.pattern_types[int(match.lastgroup[4:])]
+
+        extension = os.path.splitext(name)[1][1:]
+        try:
+            file_type = self._extension_types[extension]
+        except KeyError:
+            file_type = self._map_extension(extension)
+        if file_type is not None:
+            return file_type
+
+        if self.magic_bytes:
+            file_type = self._sniff(entry.path)
+            if file_type is not None:
+                return file_type
+            # An ambiguous extension that didn't sniff as anything.
+            file_type = self.extension_map.get(self._normalize(extension))
+            if file_type is not None:
+                return file_type
+
+        if self._size_limits:
+            file_type = self._bucket(self._size_limits, self._size_types,
+                                     entry.stat().st_size)
+            if file_type is not None:
+                return file_type
+        if self._age_limits:
+            file_type = self._bucket(
+                self._age_limits, self._age_types,
+                time.time() - entry.stat().st_mtime)
+            if file_type is not None:
+                return file_type
+        return extension
+
+
+# --------------------------------------------------------------------------- #
+# Watch mode
+
+class SortingWatcher:
+    """
+    Sorts files into the sorted folder as they arrive in the source folder.
+
+    Uses polling, so only the standard library is needed. Every tick costs
+    one stat of the source folder: it is only scanned when its modification
+    time changes, or every "rescan_interval" seconds as a safety net.
+    Changes are debounced, so a burst of new files is moved as one batch
+    once no new changes are seen for "debounce" seconds, or after
+    "max_delay" seconds during a long burst.
+
+    Files that already exist in their target folder stay in the source
+    folder, and are remembered so they are not checked again. The listings
+    of the target folders are also kept between batches, so files added to
+    them by something else are not seen.
+    """
+
+    def __init__(self, source_folder='Files', sorted_folder='SortedFiles',
+                 poll_interval=0.01, debounce=0.05, max_delay=1.0,
+                 rescan_interval=5.0, classify=classify_by_extension,
+                 workers=None):
+        self.source_folder = source_folder
+        self.sorted_folder = sorted_folder
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.rescan_interval = rescan_interval
+        self.classify = classify
+        self.workers = workers
+
+        self._stop = threading.Event()
+        self._folder_mtime = None
+        self._last_scan = 0.0
+        self._first_change = None
+        self._last_change = None
+        self._not_moved = set()
+        self._existing_by_folder = {}
+        self.files_moved = {}
+        self.files_existed = {}
+
+    def _changed(self, now):
+        """
+        Checks if the source folder has changed since the last tick.
+        """
+        try:
+            mtime = os.stat(self.source_folder).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        changed = mtime != self._folder_mtime
+        if now - self._last_scan >= self.rescan_interval:
+            self._last_scan = now
+            changed = True
+        self._folder_mtime = mtime
+        return changed
+
+    def tick(self, now=None):
+        """
+        Runs one poll. Sorts the new files if the debounce time has passed.
+
+        Returns:
+            tuple[dict[str, int], dict[str, int]] | None: Files moved and
+            files already existing per file type in this batch, or None if
+            nothing was sorted.
+        """
+        now = time.monotonic() if now is None else now
+        if self._changed(now):
+            self._last_change = now
+            if self._first_change is None:
+                self._first_change = now
+
+        if self._first_change is None:
+            return None
+        if (now - self._last_change < self.debounce
+                and now - self._first_change < self.max_delay):
+            return None
+        self._first_change = self._last_change = None
+        return self.sort_new_files(now)
+
+    def sort_new_files(self, now=None):
+        """
+        Scans the source folder and moves the files not seen before.
+        """
+        self._last_scan = time.monotonic() if now is None else now
+        try:
+            all_files = scan_files(self.source_folder)
+        except FileNotFoundError:
+            return None
+        # Forgets files no longer in the source folder.
+        self._not_moved.intersection_update(
+            entry.name for entry in all_files)
+        files = [entry for entry in all_files
+                 if entry.name not in self._not_moved]
+        if not files:
+            return None
+
+        moves, files_moved, files_existed = plan_moves(
+            files, self.sorted_folder, self.classify,
+            self._existing_by_folder)
+        moved_names = {os.path.basename(source) for source, _ in moves}
+        self._not_moved.update(entry.name for entry in files
+                               if entry.name not in moved_names)
+        run_moves(moves, self.workers)
+
+        for totals, batch in ((self.files_moved, files_moved),
+                              (self.files_existed, files_existed)):
+            for file_type, amount in batch.items():
+                totals[file_type] = totals.get(file_type, 0) + amount
+        return files_moved, files_existed
+
+    def run(self, on_batch=None):
+        """
+        Polls until stop() is called.
+
+        Args:
+            on_batch (Callable, optional): Called with (files moved, files
+                existed) after every batch.
+        """
+        self._stop.clear()
+        while not self._stop.is_set():
+            batch = self.tick()
+            if batch is not None and on_batch is not None:
+                on_batch(*batch)
+            self._stop.wait(self.poll_interval)
+
+    def stop(self):
+        """
+        Stops run(), from another thread or a callback.
+        """
+        self._stop.set()
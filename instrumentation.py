@@ -0,0 +1,199 @@
+import atexit
+from functools import wraps
+import os
+import sys
+import time
+import warnings
+
+# --------------------------------------------------------------------------- #
+"""
+The logging_current_task decorator shared by all the tasks.
+
+What the decorator does is picked by a mode, when the function is
+decorated:
+    'print'     Prints 'Now running task: <id>' before every call, as the
+                tasks always have. The default.
+    'off'       Returns the function itself, so there is no cost per call.
+    'counters'  Counts the calls of every task.
+    'timing'    Counts the calls and times each one with perf_counter_ns.
+    'sampled'   Counts the calls and times one call in every
+                "sample_every".
+The mode is set with the environment variable TASK_INSTRUMENTATION, or
+set_mode before the task modules are imported. An unknown value in the
+variable gives a warning and the default mode. In the counting modes,
+the calls and latency percentiles of every task are printed at exit.
+"""
+
+MODES = ('print', 'off', 'counters', 'timing', 'sampled')
+DEFAULT_MODE = 'print'
+HISTOGRAM_BUCKETS = 64  # Bucket i holds latencies below 2**i ns
+
+mode = os.environ.get('TASK_INSTRUMENTATION', DEFAULT_MODE)
+if mode not in MODES:
+    warnings.warn(f'Unknown TASK_INSTRUMENTATION mode: {mode!r}. Use one of '
+                  f'{MODES}. Using {DEFAULT_MODE!r}.', stacklevel=2)
+    mode = DEFAULT_MODE
+sample_every = 100
+
+
+# --------------------------------------------------------------------------- #
+# Registry
+
+class TaskStats:
+    """
+    Calls and a latency histogram of one task. Latencies are counted in
+    buckets by powers of two, so the memory used does not grow with the
+    number of calls.
+    """
+    __slots__ = ('task_id', 'calls', 'timed_calls', 'total_ns', 'max_ns',
+                 'histogram')
+
+    def __init__(self, task_id):
+        self.task_id = task_id
+        self.calls = 0
+        self.timed_calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.histogram = [0] * HISTOGRAM_BUCKETS
+
+    def add_time(self, elapsed_ns):
+        """
+        Records the latency of one call.
+        """
+        self.timed_calls += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        bucket = min(elapsed_ns.bit_length(), HISTOGRAM_BUCKETS - 1)
+        self.histogram[bucket] += 1
+
+    def percentile_ns(self, percent):
+        """
+        Returns an estimate of the given percentile of the timed calls, or
+        0 if no call was timed. The histogram only has the counts per
+        bucket, so the latencies are taken as spread evenly over the
+        bucket holding the percentile, and interpolated.
+        """
+        if not self.timed_calls:
+            return 0
+        rank = self.timed_calls * percent / 100
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            if count and seen + count >= rank:
+                lower = 1 << (bucket - 1) if bucket else 0
+                upper = min(1 << bucket, self.max_ns)
+                fraction = max(0.0, (rank - seen) / count)
+                return lower + (upper - lower) * fraction
+            seen += count
+        return self.max_ns
+
+
+# Stats of every instrumented task, by task id.
+TASK_STATS = {}
+
+
+def get_task_stats(task_id):
+    """
+    Returns the stats of a task, registering it the first time.
+    """
+    stats = TASK_STATS.get(task_id)
+    if stats is None:
+        stats = TASK_STATS[task_id] = TaskStats(task_id)
+        if len(TASK_STATS) == 1:
+            atexit.register(print_task_stats)
+    return stats
+
+
+def print_task_stats(file=None):
+    """
+    Prints the calls and latency percentiles of every task that was called.
+    """
+    file = file or sys.stderr
+    called = [stats for stats in TASK_STATS.values() if stats.calls]
+    if not called:
+        return
+    print(f'{"Task":<20} {"Calls":>10} {"Timed":>10} {"Mean µs":>10} '
+          f'{"p50 µs":>10} {"p90 µs":>10} {"p99 µs":>10} {"Max µs":>10}',
+          file=file)
+    for stats in called:
+        mean = stats.total_ns / stats.timed_calls if stats.timed_calls else 0
+        print(f'{stats.task_id:<20} {stats.calls:>10} {stats.timed_calls:>10} '
+              f'{mean / 1000:>10.1f} '
+              f'{stats.percentile_ns(50) / 1000:>10.1f} '
+              f'{stats.percentile_ns(90) / 1000:>10.1f} '
+              f'{stats.percentile_ns(99) / 1000:>10.1f} '
+              f'{stats.max_ns / 1000:>10.1f}', file=file)
+
+
+def set_mode(new_mode, new_sample_every=None):
+    """
+    Sets the mode for functions decorated from now on.
+
+    Raises:
+        ValueError: If the mode is unknown or "new_sample_every" is not an
+            integer of 1 or more.
+    """
+    global mode, sample_every
+    if new_mode not in MODES:
+        raise ValueError(f'Unknown mode: {new_mode!r}. Use one of {MODES}')
+    if new_sample_every is not None and (
+            not isinstance(new_sample_every, int) or new_sample_every < 1):
+        raise ValueError('"sample_every" must be an integer of 1 or more, '
+                         f'not {new_sample_every!r}')
+    mode = new_mode
+    if new_sample_every is not None:
+        sample_every = new_sample_every
+
+
+# --------------------------------------------------------------------------- #
+# Decorator
+
+def logging_current_task(task_id, blank_line=True):
+    """
+    Decorator to log what task is currently running, in the current mode.
+
+    Args:
+        task_id (str): The task, like '5A'.
+        blank_line (bool): Prints an empty line after the task in 'print'
+            mode.
+    """
+    if mode not in MODES:
+        raise ValueError(f'Unknown mode: {mode!r}. Use one of {MODES}')
+
+    def decorator(func):
+        if mode == 'off':
+            return func
+
+        if mode == 'print':
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                print(f'Now running task: {task_id}')
+                result = func(*args, **kwargs)
+                if blank_line:
+                    print()
+                return result
+            return wrapper
+
+        stats = get_task_stats(task_id)
+        if mode == 'counters':
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                stats.calls += 1
+                return func(*args, **kwargs)
+            return wrapper
+
+        every = 1 if mode == 'timing' else sample_every
+        clock = time.perf_counter_ns
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            stats.calls += 1
+            if stats.calls % every:
+                return func(*args, **kwargs)
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.add_time(clock() - start)
+        return wrapper
+    return decorator
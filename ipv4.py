@@ -0,0 +1,338 @@
+from array import array
+from bisect import bisect_right
+
+# --------------------------------------------------------------------------- #
+"""
+Batch validation and parsing of IPv4 addresses.
+
+Used by task 3A, and for validating large numbers of addresses like the
+ones in access logs, without the task decorator printing on every call.
+An address is valid when it has four parts separated by '.', each a
+number between 0 and 255, the same rules as task 3A. Valid addresses are
+packed into 32-bit integers, and batches are returned as array('I') with
+one validity flag per address in a bytearray.
+
+CidrIndex finds the longest matching CIDR prefix (like '10.0.0.0/8') of
+packed addresses, for classifying them against blocklists and subnets.
+"""
+
+# The value of every octet written the usual way ('0' to '255'), so most
+# octets are parsed with one dict lookup instead of isdigit() and int().
+OCTET_VALUES = {str(value): value for value in range(256)}
+
+CHUNK_SIZE = 1 << 20  # Bytes of lines read from a file at a time
+
+
+# --------------------------------------------------------------------------- #
+# Parsing
+
+def _octet_value(part):
+    """
+    Returns the value of an octet not in OCTET_VALUES (like '001'),
+    or -1 if it is not a number between 0 and 255.
+    """
+    if not part.isdecimal():
+        return -1
+    value = int(part)
+    return value if value <= 255 else -1
+
+
+def parse_ipv4(address: str) -> int | None:
+    """
+    Parses an IPv4 address into a packed 32-bit integer.
+
+    Args:
+        address (str): The address, like '192.168.1.1'.
+    Returns:
+        int | None: The packed address, or None if it is invalid.
+    """
+    parts = address.split('.')
+    if len(parts) != 4:
+        return None
+    try:
+        return ((OCTET_VALUES[parts[0]] << 24)
+                | (OCTET_VALUES[parts[1]] << 16)
+                | (OCTET_VALUES[parts[2]] << 8) | OCTET_VALUES[parts[3]])
+    except KeyError:
+        pass
+    packed = 0
+    for part in parts:
+        value = OCTET_VALUES.get(part)
+        if value is None:
+            value = _octet_value(part)
+            if value < 0:
+                return None
+        packed = (packed << 8) | value
+    return packed
+
+
+def is_valid_ipv4(address: str) -> bool:
+    """
+    Checks if a string is a valid IPv4 address.
+    """
+    return parse_ipv4(address) is not None
+
+
+def format_ipv4(packed: int) -> str:
+    """
+    Returns the normalised address ('192.168.1.1') of a packed address.
+    """
+    return (f'{packed >> 24}.{(packed >> 16) & 255}.'
+            f'{(packed >> 8) & 255}.{packed & 255}')
+
+
+# --------------------------------------------------------------------------- #
+# Batches
+
+def parse_ipv4_batch(addresses, packed=None, valid=None):
+    """
+    Parses many IPv4 addresses.
+
+    Args:
+        addresses (Iterable[str]): The addresses. A trailing newline, like
+            on lines read from a file, is ignored.
+        packed (array, optional): array('I') to append the packed
+            addresses to. Invalid addresses are packed as 0.
+        valid (bytearray, optional): Flags to append to, 1 for every valid
+            address and 0 for every invalid one.
+    Returns:
+        tuple[array, bytearray]: The packed addresses and validity flags.
+    """
+    if packed is None:
+        packed = array('I')
+    if valid is None:
+        valid = bytearray()
+    append_packed = packed.append
+    append_valid = valid.append
+    for address in addresses:
+        value = parse_ipv4(address.rstrip('\n'))
+        if value is None:
+            append_packed(0)
+            append_valid(0)
+        else:
+            append_packed(value)
+            append_valid(1)
+    return packed, valid
+
+
+def read_ipv4_chunks(filename, chunk_size=CHUNK_SIZE):
+    """
+    Reads a file with one address per line in chunks of lines.
+
+    Yields:
+        list[str]: About chunk_size bytes of lines at a time.
+    """
+    with open(filename, encoding='utf-8') as file:
+        while lines := file.readlines(chunk_size):
+            yield lines
+
+
+def parse_ipv4_file(filename, chunk_size=CHUNK_SIZE):
+    """
+    Parses a file with one IPv4 address per line, a chunk at a time.
+
+    Returns:
+        tuple[array, bytearray]: The packed addresses and validity flags,
+        by line.
+    """
+    packed = array('I')
+    valid = bytearray()
+    for lines in read_ipv4_chunks(filename, chunk_size):
+        parse_ipv4_batch(lines, packed, valid)
+    return packed, valid
+
+
+def invalid_indexes(valid):
+    """
+    Returns the indexes of the invalid addresses in a list of flags.
+    """
+    indexes = []
+    index = valid.find(0)
+    while index >= 0:
+        indexes.append(index)
+        index = valid.find(0, index + 1)
+    return indexes
+
+
+def valid_packed(packed, valid):
+    """
+    Returns array('I') with only the valid packed addresses.
+    """
+    if valid.count(0) == 0:
+        return array('I', packed)
+    return array('I', (value for value, flag in zip(packed, valid) if flag))
+
+
+
+# --------------------------------------------------------------------------- #
+# CIDR prefixes
+
+def parse_cidr(cidr: str) -> tuple[int, int]:
+    """
+    Parses a CIDR prefix like '10.0.0.0/8'. Host bits are cleared, so
+    '10.1.2.3/8' is the same as '10.0.0.0/8'. An address without a length
+    is a /32 prefix.
+
+    Returns:
+        tuple[int, int]: The packed network address and the prefix length.
+    Raises:
+        ValueError: If the address or the length is invalid.
+    """
+    address, _, length = cidr.partition('/')
+    network = parse_ipv4(address)
+    if network is None:
+        raise ValueError(f'Invalid IPv4 address in CIDR: {cidr!r}')
+    if not length:
+        return network, 32
+    if not length.isdecimal() or int(length) > 32:
+        raise ValueError(f'Invalid prefix length in CIDR: {cidr!r}')
+    length = int(length)
+    mask = (0xFFFFFFFF << (32 - length)) & 0xFFFFFFFF
+    return network & mask, length
+
+
+class CidrIndex:
+    """
+    Longest-prefix match of IPv4 addresses against CIDR prefixes.
+
+    The prefixes are flattened into sorted, non-overlapping address ranges,
+    each belonging to the longest prefix covering it, so a lookup is one
+    binary search whatever the number of prefixes. The ranges are built
+    the first time the index is searched after prefixes are added.
+
+    Args:
+        prefixes (Iterable[tuple[str, object]]): (cidr, label) pairs.
+    """
+
+    def __init__(self, prefixes=()):
+        self.labels = []  # Label of every prefix, by prefix index
+        self._prefixes = []  # (network, length, prefix index)
+        self._starts = array('I')
+        self._ends = array('I')
+        self._ids = array('i')
+        self._built = True
+        for cidr, label in prefixes:
+            self.add(cidr, label)
+
+    @classmethod
+    def from_file(cls, filename):
+        """
+        Loads prefixes from a text file with one CIDR per line, optionally
+        followed by a label ('10.0.0.0/8 internal'). The label defaults to
+        the CIDR. Blank lines and lines starting with '#' are skipped.
+
+        Raises:
+            ValueError: If a line has an invalid CIDR, with its line number.
+        """
+        index = cls()
+        with open(filename, encoding='utf-8') as file:
+            for line_number, line in enumerate(file, start=1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                cidr, _, label = line.partition(' ')
+                try:
+                    index.add(cidr, label.strip() or cidr)
+                except ValueError as e:
+                    raise ValueError(f'Line {line_number}: {e}') from None
+        return index
+
+    def __len__(self):
+        return len(self.labels)
+
+    def add(self, cidr, label=None):
+        """
+        Adds a prefix. The label defaults to the CIDR. When the same prefix
+        is added twice, the last label wins.
+        """
+        network, length = parse_cidr(cidr)
+        self._prefixes.append((network, length, len(self.labels)))
+        self.labels.append(cidr if label is None else label)
+        self._built = False
+
+    def _build(self):
+        """
+        Flattens the prefixes into non-overlapping ranges.
+
+        Prefixes are either nested or disjoint, so they are walked in order
+        of network address, shortest first, keeping a stack of the prefixes
+        containing the current address. The top of the stack is the longest.
+        """
+        starts = array('I')
+        ends = array('I')
+        ids = array('i')
+
+        def emit(start, end, prefix_id):
+            if start <= end:
+                starts.append(start)
+                ends.append(end)
+                ids.append(prefix_id)
+
+        stack = []  # (last address, prefix index)
+        position = 0  # First address not given a range yet
+        for network, length, prefix_id in sorted(self._prefixes):
+            while stack and stack[-1][0] < network:
+                last, top_id = stack.pop()
+                emit(position, last, top_id)
+                position = last + 1
+            if stack:
+                emit(position, network - 1, stack[-1][1])
+            position = network
+            stack.append((network | (0xFFFFFFFF >> length), prefix_id))
+        while stack:
+            last, top_id = stack.pop()
+            emit(position, last, top_id)
+            position = last + 1
+
+        self._starts, self._ends, self._ids = starts, ends, ids
+        self._built = True
+
+    def lookup_index(self, packed: int) -> int:
+        """
+        Returns the index of the longest prefix containing a packed
+        address, or -1 if none does.
+        """
+        if not self._built:
+            self._build()
+        i = bisect_right(self._starts, packed) - 1
+        if i >= 0 and packed <= self._ends[i]:
+            return self._ids[i]
+        return -1
+
+    def lookup(self, address):
+        """
+        Returns the label of the longest prefix containing an address
+        (str or packed int), or None if none does or it is invalid.
+        """
+        if isinstance(address, str):
+            address = parse_ipv4(address)
+            if address is None:
+                return None
+        prefix_id = self.lookup_index(address)
+        return self.labels[prefix_id] if prefix_id >= 0 else None
+
+    def lookup_batch(self, packed, valid=None):
+        """
+        Finds the longest prefix of many packed addresses, like the ones
+        from parse_ipv4_batch.
+
+        Args:
+            packed (Iterable[int]): The packed addresses.
+            valid (bytearray, optional): Validity flags. Invalid addresses
+                get no match.
+        Returns:
+            array: array('i') with the prefix index of every address, or
+            -1 where there is no match. Use "labels" to get the labels.
+        """
+        if not self._built:
+            self._build()
+        starts, ends, ids = self._starts, self._ends, self._ids
+        result = array('i')
+        append = result.append
+        for value in packed:
+            i = bisect_right(starts, value) - 1
+            append(ids[i] if i >= 0 and value <= ends[i] else -1)
+        if valid is not None:
+            for i in invalid_indexes(valid):
+                result[i] = -1
+        return result
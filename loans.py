@@ -0,0 +1,1990 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import hashlib
+import heapq
+from datetime import datetime, date
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+import tempfile
+from functools import lru_cache
+
+from date_parsing import is_valid_date, parse_date_ordinal
+
+# --------------------------------------------------------------------------- #
+"""
+Library code for the loaned books in task 5.
+
+LoanedBooks is one validated row of the CSV file, and the rest of the
+module reads many rows without keeping an object per row: LoanTable
+stores the rows in typed columns (with an mmap snapshot next to the CSV
+file), LoanRepository indexes LoanedBooks for ad-hoc queries, OverdueIndex
+answers overdue questions, and LoanReportEngine runs the reports of tasks
+5A-5E in one pass, serially, in parallel processes or incrementally.
+Rows failing validation are streamed to a CsvErrorSink.
+
+The task functions printing the reports are in oppgave5.
+"""
+
+# --------------------------------------------------------------------------- #
+# Generator to read CSV file.
+def read_csv_in_chunks(filename, with_line_numbers=False):
+    """
+    Yields rows from a CSV file as dictionaries.
+    With "with_line_numbers" it yields (line number, row) instead.
+    """
+    with open(filename, 'r', encoding='utf-8') as csvfile:
+        csv_reader = csv.DictReader(csvfile)
+        for row in csv_reader:
+            if with_line_numbers:
+                yield csv_reader.line_num, row
+            else:
+                yield row
+
+
+PARALLEL_RANGE_SIZE = 16 * 1024 * 1024  # Bytes per range read by a worker
+
+
+# Function to split a CSV file into parts that can be read in parallel.
+def split_csv_into_byte_ranges(filename, range_size=PARALLEL_RANGE_SIZE):
+    """
+    Splits the rows of a CSV file into newline-aligned byte ranges of
+    about range_size bytes each.
+
+    Rows with quoted newlines inside a field are not supported, since the
+    ranges are only aligned to line breaks.
+
+    Returns:
+        tuple[list[str], list[tuple[int, int]]]: The field names from the
+        header, and (start, end) byte offsets for every range.
+    """
+    with open(filename, 'rb') as csvfile:
+        header = csvfile.readline()
+        data_start = csvfile.tell()
+        file_size = os.fstat(csvfile.fileno()).st_size
+
+        boundaries = [data_start]
+        while boundaries[-1] + range_size < file_size:
+            csvfile.seek(boundaries[-1] + range_size)
+            csvfile.readline()
+            boundaries.append(csvfile.tell())
+        if boundaries[-1] < file_size:
+            boundaries.append(file_size)
+
+    fieldnames = next(csv.reader([header.decode('utf-8')]))
+    return fieldnames, list(zip(boundaries, boundaries[1:]))
+
+
+# Error raised when a field in the CSV file is invalid.
+class LoanValidationError(ValueError):
+    """
+    A ValueError for an invalid loan field.
+
+    Attributes:
+        kind (str): The type of error: "date", "int", "returned" or "genre".
+    """
+
+    def __init__(self, message, kind):
+        super().__init__(message)
+        self.kind = kind
+
+
+# Class LoanedBooks blueprint to easily work with the data from the CSV File.
+class LoanedBooks:
+    """
+    Represents a loaned book with details about the loan.
+    """
+
+    valid_genres = {'fiksjon', 'krim', 'sakprosa', 'fantasy'}
+    valid_returned_values = {'ja', 'nei'}
+
+    def __init__(self, first_name, last_name, book_title, genre,
+                 loan_date, returned, loan_period=14, extended=0):
+        self.validate_fields(genre, loan_date, returned, loan_period, extended)
+
+        self.first_name = first_name
+        self.last_name = last_name
+        self.book_title = book_title
+        self.genre = genre
+        self.loan_date = datetime.fromordinal(parse_date_ordinal(loan_date))
+        self.loan_period = int(loan_period)
+        self.extended = int(extended)
+        self.returned = returned
+
+    @classmethod
+    def create_object_from_dict(cls, data):
+        """
+        Creates a LoanedBooks object from a dictionary.
+
+        # Fornavn, Etternavn, Boktittel, Sjanger,
+        # Lånedato, Låneperiode, Forlenget, Tilbakelevert
+        """
+        try:
+            return cls.from_dict(data), None
+        except ValueError as e:
+            return None,f'Error on row: {data} | Error: {e}'
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Creates a LoanedBooks object from a dictionary.
+        Raises ValueError if the data is invalid.
+        """
+        return cls(
+            data['Fornavn'], data['Etternavn'], data['Boktittel'],
+            data['Sjanger'], data['Lånedato'], data['Tilbakelevert'],
+            loan_period=data.get('Låneperiode', 14),
+            extended=data.get('Forlenget', 0)
+        )
+
+    @classmethod
+    def validate_fields(cls, genre, loan_date, returned,
+                        loan_period=14, extended=0):
+        """
+        Validates the fields of a loan.
+        Raises ValueError describing the first invalid field.
+        """
+        cls.validate_loan_terms(loan_date, loan_period, extended)
+        cls.validate_categories(genre, returned)
+
+    @classmethod
+    def validate_loan_terms(cls, loan_date, loan_period=14, extended=0):
+        """
+        Validates loan date, loan period and extension.
+        Raises ValueError describing the first invalid field.
+        """
+        if not cls.validate_date(loan_date):
+            raise LoanValidationError(
+                'Invalid date format for "Lånedato"', 'date')
+        if not cls.validate_int(loan_period):
+            raise LoanValidationError(
+                '"Låneperiode" must be an integer', 'int')
+        if not cls.validate_int(extended):
+            raise LoanValidationError(
+                '"Forlenget" must be an integer', 'int')
+
+    @classmethod
+    def validate_categories(cls, genre, returned):
+        """
+        Validates return status and genre.
+        Raises ValueError describing the first invalid field.
+        """
+        if not cls.validate_return(returned):
+            raise LoanValidationError(
+                '"Returned" must be in list: ["Ja","Nei"]', 'returned')
+        if not cls.validate_genre(genre):
+            raise LoanValidationError(
+                '"Genre" must be in list: '
+                '["fiksjon", "krim", "sakprosa", "fantasy"]', 'genre')
+
+    @classmethod
+    def validate_return(cls, returned):
+        """
+        Validates if the return status is valid.
+        """
+        return returned.lower() in cls.valid_returned_values
+
+    @classmethod
+    def validate_genre(cls, genre):
+        """
+        Validates if the genre is valid.
+        """
+        return genre.lower() in cls.valid_genres
+
+    @staticmethod
+    def validate_name(name):
+        """
+        Validates if the name contains only letters.
+        """
+        return name.isalpha()
+
+    @staticmethod
+    def validate_date(date_str):
+        """
+        Validates if a date is in 'dd/mm/yyyy' format.
+        """
+        return is_valid_date(date_str)
+
+    @staticmethod
+    def validate_int(value):
+        """
+        Validates if a value is an integer.
+        """
+        if isinstance(value, int):
+            return True
+        try:
+            value = int(value)
+            return value >= 0
+        except ValueError:
+            return False
+
+
+    def __str__(self):
+        return (f'{self.book_title} was loaned out to '
+                f'{self.first_name} {self.last_name} '
+                f'on date {self.loan_date}')
+
+    def returned_on_time(self):
+        """
+        Checks if the book was returned on time.
+        """
+        if self.returned.lower() == 'ja':
+            return True
+        return False
+
+    def check_extension(self):
+        """
+        Returns the number of days the loan was extended.
+        """
+        return self.extended
+
+    def get_title(self):
+        """
+        Returns the title of the book.
+        """
+        return self.book_title
+
+    def get_genre(self):
+        """
+        Returns the genre of the book.
+        """
+        return self.genre
+
+    def get_loan_period(self):
+        """
+        Returns the total loan period, including extensions.
+        """
+        return self.loan_period + self.extended
+
+    def get_full_name_loaner(self):
+        """
+        Returns the full name of the loaner.
+        """
+        return f'{self.first_name} {self.last_name}'
+
+
+# Class CompactLoanedBooks, a smaller and faster variant of LoanedBooks.
+class CompactLoanedBooks:
+    """
+    Same data and methods as LoanedBooks, using less memory per loan.
+
+    Uses __slots__ instead of a __dict__, interns genre and returned values
+    and shares one datetime object per loan date. Genre and returned values
+    that have been validated before are not validated (and lowercased)
+    again.
+
+    With trusted=True nothing is validated or converted, for input that is
+    validated already: loan_date must be a datetime, loan_period and
+    extended must be ints.
+    """
+
+    __slots__ = ('first_name', 'last_name', 'book_title', 'genre',
+                 'loan_date', 'loan_period', 'extended', 'returned')
+
+    valid_genres = LoanedBooks.valid_genres
+    valid_returned_values = LoanedBooks.valid_returned_values
+
+    # Genre and returned values seen before, mapped to interned strings.
+    _known_categories = {}
+
+    def __init__(self, first_name, last_name, book_title, genre,
+                 loan_date, returned, loan_period=14, extended=0,
+                 trusted=False):
+        if not trusted:
+            # Converts directly, and only runs the LoanedBooks validators
+            # to raise the right error when something is wrong.
+            try:
+                loan_day = parse_date_ordinal(loan_date)
+                period_days = int(loan_period)
+                extended_days = int(extended)
+                valid_terms = period_days >= 0 and extended_days >= 0
+            except ValueError:
+                valid_terms = False
+            if not valid_terms:
+                LoanedBooks.validate_loan_terms(
+                    loan_date, loan_period, extended)
+            loan_date = loan_datetime(loan_day)
+            loan_period = period_days
+            extended = extended_days
+            genre, returned = self._checked_categories(genre, returned)
+        else:
+            genre = sys.intern(genre)
+            returned = sys.intern(returned)
+
+        self.first_name = first_name
+        self.last_name = last_name
+        self.book_title = book_title
+        self.genre = genre
+        self.loan_date = loan_date
+        self.loan_period = loan_period
+        self.extended = extended
+        self.returned = returned
+
+    @classmethod
+    def _checked_categories(cls, genre, returned):
+        """
+        Returns interned genre and returned values, validating them the
+        first time they are seen.
+        """
+        known = cls._known_categories.get((genre, returned))
+        if known is None:
+            LoanedBooks.validate_categories(genre, returned)
+            known = (sys.intern(genre), sys.intern(returned))
+            cls._known_categories[(genre, returned)] = known
+        return known
+
+    @classmethod
+    def from_record(cls, record):
+        """
+        Creates a CompactLoanedBooks object from a validated LoanRecord.
+        """
+        return cls(record.first_name, record.last_name, record.book_title,
+                   record.genre, loan_datetime(record.loan_date),
+                   'Ja' if record.returned else 'Nei',
+                   loan_period=record.loan_period, extended=record.extended,
+                   trusted=True)
+
+    # Same behaviour as LoanedBooks.
+    create_object_from_dict = classmethod(
+        LoanedBooks.create_object_from_dict.__func__)
+    from_dict = classmethod(LoanedBooks.from_dict.__func__)
+    __str__ = LoanedBooks.__str__
+    returned_on_time = LoanedBooks.returned_on_time
+    check_extension = LoanedBooks.check_extension
+    get_title = LoanedBooks.get_title
+    get_genre = LoanedBooks.get_genre
+    get_loan_period = LoanedBooks.get_loan_period
+    get_full_name_loaner = LoanedBooks.get_full_name_loaner
+
+
+@lru_cache(maxsize=4096)
+def loan_datetime(day_ordinal):
+    """
+    Returns a shared datetime object for a day ordinal.
+    """
+    return datetime.fromordinal(day_ordinal)
+
+
+def day_ordinal(day):
+    """
+    Returns the day ordinal of a date object or a "dd/mm/yyyy" string.
+    """
+    if isinstance(day, str):
+        return parse_date_ordinal(day)
+    return day.toordinal()
+
+
+# A validated row from the CSV file, without the overhead of LoanedBooks.
+# loan_date is a day ordinal and returned is a bool.
+LoanRecord = namedtuple('LoanRecord', [
+    'first_name', 'last_name', 'book_title', 'genre',
+    'loan_date', 'loan_period', 'extended', 'returned'])
+
+# Loan periods and extensions are stored as C longs ('l') in LoanTable.
+LOAN_INT_MAX = (1 << (8 * array('l').itemsize - 1)) - 1
+LOAN_INT_MIN = -LOAN_INT_MAX - 1
+
+
+def parse_loan_row(data):
+    """
+    Validates a row from the CSV file and returns it as a LoanRecord.
+    Raises ValueError with the same messages as LoanedBooks.
+    """
+    loan_period = data.get('Låneperiode', 14)
+    extended = data.get('Forlenget', 0)
+    LoanedBooks.validate_fields(data['Sjanger'], data['Lånedato'],
+                                data['Tilbakelevert'], loan_period, extended)
+    loan_period, extended = int(loan_period), int(extended)
+    if not LOAN_INT_MIN <= loan_period <= LOAN_INT_MAX:
+        raise LoanValidationError('"Låneperiode" is out of range', 'int')
+    if not LOAN_INT_MIN <= extended <= LOAN_INT_MAX:
+        raise LoanValidationError('"Forlenget" is out of range', 'int')
+    return LoanRecord(
+        data['Fornavn'], data['Etternavn'], data['Boktittel'],
+        data['Sjanger'],
+        parse_date_ordinal(data['Lånedato']),
+        loan_period, extended,
+        data['Tilbakelevert'].lower() == 'ja')
+
+
+# --------------------------------------------------------------------------- #
+# Class LoanReports, the reports of tasks 5A-5E.
+# The task functions only use these methods, so they work the same for a
+# list of objects, a LoanTable and a LoanReportEngine.
+class LoanReports:
+    """
+    The reports of tasks 5A-5E over a collection of loans.
+
+    The methods here iterate over LoanedBooks (or CompactLoanedBooks)
+    objects. LoanTable and LoanReportEngine compute the same reports from
+    their own data.
+    """
+
+    def total_extended(self):
+        """
+        Returns the number of days all loans were extended.
+        """
+        return sum(book.extended for book in self)
+
+    def count_genres_not_returned(self):
+        """
+        Counts books not returned per genre, in order of first appearance.
+        """
+        counts = {}
+        for book in self:
+            if not book.returned_on_time():
+                counts[book.genre] = counts.get(book.genre, 0) + 1
+        return counts
+
+    def average_loan_length(self):
+        """
+        Returns the average loan period, including extensions.
+        """
+        return sum(book.get_loan_period() for book in self) / len(self)
+
+    def not_returned_loans(self):
+        """
+        Returns 'Book: <title>, Loaner: <name>' for every book not returned.
+        """
+        return [f'Book: {book.book_title},'
+                f' Loaner: {book.get_full_name_loaner()}'
+                for book in self if not book.returned_on_time()]
+
+    def count_titles(self):
+        """
+        Counts the number of loans per title.
+        """
+        counts = {}
+        for book in self:
+            counts[book.book_title] = counts.get(book.book_title, 0) + 1
+        return counts
+
+    def most_loaned(self, top_k=None):
+        """
+        Returns (title, amount) tuples, most loaned first and titles with
+        the same amount alphabetically. With "top_k" only the top k.
+        """
+        return top_k_counts(self.count_titles(), top_k)
+
+
+class LoanedBooksList(LoanReports, list):
+    """
+    A list of LoanedBooks objects with the reports of tasks 5A-5E.
+    """
+
+
+def as_loan_reports(loans):
+    """
+    Returns loans as LoanReports, wrapping a plain list or other iterable
+    of LoanedBooks objects in a LoanedBooksList.
+    """
+    if isinstance(loans, LoanReports):
+        return loans
+    return LoanedBooksList(loans)
+
+
+# --------------------------------------------------------------------------- #
+# Class LoanTable, a columnar store for the same data as LoanedBooks.
+# Used for large files where one object per row would use too much memory.
+class LoanTable(LoanReports):
+    """
+    Columnar, array-backed store of loaned books.
+
+    Loan date (as day ordinal), loan period, extension and returned flag are
+    stored in typed arrays. Title, genre and borrower are dictionary-encoded
+    into integer codes. LoanedBooks objects are only built on demand, when
+    a row is asked for with table[i].
+    """
+
+    # Name and array typecode of every column.
+    columns = (('loan_dates', 'l'), ('loan_periods', 'l'),
+               ('extensions', 'l'), ('returned', 'b'),
+               ('title_codes', 'L'), ('genre_codes', 'L'),
+               ('borrower_codes', 'L'))
+
+    def __init__(self):
+        for name, typecode in self.columns:
+            setattr(self, name, array(typecode))
+
+        # Values for the codes, and lookups from value to code.
+        self.titles = []
+        self.genres = []
+        self.borrowers = []
+        self._title_lookup = {}
+        self._genre_lookup = {}
+        self._borrower_lookup = {}
+
+    @staticmethod
+    def _encode(value, values, lookup):
+        """
+        Returns the code for a value, adding it to the dictionary if new.
+        """
+        code = lookup.get(value)
+        if code is None:
+            code = len(values)
+            lookup[value] = code
+            values.append(value)
+        return code
+
+    @classmethod
+    def from_csv(cls, filename, error_sink=None):
+        """
+        Creates a LoanTable from a CSV file.
+
+        Returns:
+            tuple[LoanTable, list[str]]: The table and the rows that failed
+            validation, formatted like LoanedBooks.create_object_from_dict.
+            If an "error_sink" (CsvErrorSink) is given, errors are streamed
+            to it and the list is empty.
+        """
+        table = cls()
+        errors = []
+        for line_number, row in read_csv_in_chunks(filename,
+                                                   with_line_numbers=True):
+            try:
+                table.append_row(row)
+            except ValueError as e:
+                if error_sink is not None:
+                    error_sink.add(line_number, row, e)
+                else:
+                    errors.append(f'Error on row: {row} | Error: {e}')
+        return table, errors
+
+    def append_row(self, data):
+        """
+        Validates a row from the CSV file and appends it to the table.
+        Raises ValueError with the same messages as LoanedBooks.
+        """
+        self.append_record(parse_loan_row(data))
+
+    def append_record(self, record):
+        """
+        Appends an already validated LoanRecord to the table.
+        """
+        self.loan_dates.append(record.loan_date)
+        self.loan_periods.append(record.loan_period)
+        self.extensions.append(record.extended)
+        self.returned.append(record.returned)
+        self.title_codes.append(self._encode(
+            record.book_title, self.titles, self._title_lookup))
+        self.genre_codes.append(self._encode(
+            record.genre, self.genres, self._genre_lookup))
+        self.borrower_codes.append(self._encode(
+            (record.first_name, record.last_name),
+            self.borrowers, self._borrower_lookup))
+
+    def __len__(self):
+        return len(self.loan_dates)
+
+    def __getitem__(self, i):
+        """
+        Builds the LoanedBooks object for row i.
+        """
+        first_name, last_name = self.borrowers[self.borrower_codes[i]]
+        return LoanedBooks(
+            first_name, last_name,
+            self.titles[self.title_codes[i]],
+            self.genres[self.genre_codes[i]],
+            date.fromordinal(self.loan_dates[i]).strftime('%d/%m/%Y'),
+            'Ja' if self.returned[i] else 'Nei',
+            loan_period=self.loan_periods[i],
+            extended=self.extensions[i]
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def get_title(self, i):
+        """
+        Returns the title of the book in row i.
+        """
+        return self.titles[self.title_codes[i]]
+
+    def get_full_name_loaner(self, i):
+        """
+        Returns the full name of the loaner in row i.
+        """
+        return ' '.join(self.borrowers[self.borrower_codes[i]])
+
+    def total_extended(self):
+        """
+        Returns the number of days all loans were extended.
+        """
+        return sum(self.extensions)
+
+    def total_loan_period(self):
+        """
+        Returns the sum of all loan periods, including extensions.
+        """
+        return sum(self.loan_periods) + sum(self.extensions)
+
+    def average_loan_length(self):
+        """
+        Returns the average loan period, including extensions.
+        """
+        return self.total_loan_period() / len(self)
+
+    def not_returned_rows(self):
+        """
+        Returns the row numbers of books not returned.
+        """
+        return [i for i, returned in enumerate(self.returned) if not returned]
+
+    def not_returned_loans(self):
+        """
+        Returns 'Book: <title>, Loaner: <name>' for every book not returned.
+        """
+        return [f'Book: {self.get_title(i)},'
+                f' Loaner: {self.get_full_name_loaner(i)}'
+                for i in self.not_returned_rows()]
+
+    def count_genres_not_returned(self):
+        """
+        Counts books not returned per genre, in order of first appearance.
+        """
+        counts = {}
+        genre_codes = self.genre_codes
+        for i in self.not_returned_rows():
+            code = genre_codes[i]
+            counts[code] = counts.get(code, 0) + 1
+        return {self.genres[code]: amount for code, amount in counts.items()}
+
+    def count_titles(self):
+        """
+        Counts the number of loans per title.
+        """
+        counts = [0] * len(self.titles)
+        for code in self.title_codes:
+            counts[code] += 1
+        return dict(zip(self.titles, counts))
+
+
+# --------------------------------------------------------------------------- #
+# Binary snapshot of a LoanTable.
+# Written next to the CSV file, so later runs can mmap the validated data
+# instead of parsing the CSV file again. The snapshot is keyed by the size,
+# modification time and SHA-256 of the CSV file.
+#
+# Layout: header, one fixed-width array per column (8 byte aligned), and a
+# string table as UTF-8 JSON with titles, genres, borrowers and errors.
+
+SNAPSHOT_MAGIC = b'LOANTBL1'
+SNAPSHOT_VERSION = 1
+# magic, version, byte order, typecodes, rows, csv size, csv mtime,
+# csv sha256, string table offset, string table length
+SNAPSHOT_HEADER = struct.Struct('<8sI8s16sQQq32sQQ')
+
+
+def snapshot_path(csv_filename):
+    """
+    Returns the path of the snapshot for a CSV file.
+    """
+    return f'{csv_filename}.loancache'
+
+
+def file_sha256(filename):
+    """
+    Returns the SHA-256 digest of a file, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.digest()
+
+
+def snapshot_typecodes():
+    """
+    Returns the typecodes and item sizes of the columns, so a snapshot
+    from a platform with other sizes is not used.
+    """
+    return ''.join(f'{typecode}{array(typecode).itemsize}'
+                   for _, typecode in LoanTable.columns).encode('ascii')
+
+
+def save_loan_table_snapshot(loan_table, errors, csv_filename):
+    """
+    Writes a LoanTable and its errors to the snapshot for a CSV file.
+    """
+    csv_stat = os.stat(csv_filename)
+    temporary_file = f'{snapshot_path(csv_filename)}.tmp'
+    with open(temporary_file, 'wb') as snapshot:
+        snapshot.write(bytes(SNAPSHOT_HEADER.size))
+        for name, _ in loan_table.columns:
+            snapshot.write(bytes(-snapshot.tell() % 8))
+            snapshot.write(getattr(loan_table, name).tobytes())
+
+        strings_offset = snapshot.tell()
+        strings = json.dumps({
+            'titles': loan_table.titles,
+            'genres': loan_table.genres,
+            'borrowers': loan_table.borrowers,
+            'errors': errors,
+        }, ensure_ascii=False).encode('utf-8')
+        snapshot.write(strings)
+
+        snapshot.seek(0)
+        snapshot.write(SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION, sys.byteorder.encode('ascii'),
+            snapshot_typecodes(), len(loan_table), csv_stat.st_size,
+            csv_stat.st_mtime_ns, file_sha256(csv_filename),
+            strings_offset, len(strings)))
+    os.replace(temporary_file, snapshot_path(csv_filename))
+
+
+def load_loan_table_snapshot(csv_filename):
+    """
+    Loads the snapshot for a CSV file with mmap.
+
+    The snapshot is used if the size and modification time of the CSV file
+    are unchanged. If only the modification time changed, the SHA-256 of
+    the file decides, and a match updates the time in the snapshot header.
+
+    Returns:
+        tuple[LoanTable, list[str]] | None: The table, with read-only
+        columns backed by the snapshot, and the errors. None if there is no
+        usable snapshot.
+    """
+    try:
+        with open(snapshot_path(csv_filename), 'rb') as snapshot:
+            snapshot_map = mmap.mmap(snapshot.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    if len(snapshot_map) < SNAPSHOT_HEADER.size:
+        return None
+    (magic, version, byteorder, typecodes, rows, csv_size, csv_mtime,
+     csv_sha256, strings_offset, strings_length) = (
+        SNAPSHOT_HEADER.unpack_from(snapshot_map))
+    if (magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION
+            or byteorder.rstrip(b'\0') != sys.byteorder.encode('ascii')
+            or typecodes.rstrip(b'\0') != snapshot_typecodes()):
+        return None
+
+    csv_stat = os.stat(csv_filename)
+    if csv_stat.st_size != csv_size:
+        return None
+    if csv_stat.st_mtime_ns != csv_mtime:
+        if file_sha256(csv_filename) != csv_sha256:
+            return None
+        # Same content, so the new mtime is stored to skip the hash next
+        # time. Only the header is rewritten, with a single write.
+        header = SNAPSHOT_HEADER.pack(
+            magic, version, byteorder, typecodes, rows, csv_size,
+            csv_stat.st_mtime_ns, csv_sha256, strings_offset, strings_length)
+        try:
+            fd = os.open(snapshot_path(csv_filename), os.O_WRONLY)
+            try:
+                os.pwrite(fd, header, 0)
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
+
+    loan_table = LoanTable()
+    view = memoryview(snapshot_map)
+    offset = SNAPSHOT_HEADER.size
+    for name, typecode in loan_table.columns:
+        offset += -offset % 8
+        size = rows * array(typecode).itemsize
+        setattr(loan_table, name, view[offset:offset + size].cast(typecode))
+        offset += size
+
+    strings = json.loads(
+        bytes(view[strings_offset:strings_offset + strings_length]))
+    loan_table.titles = strings['titles']
+    loan_table.genres = strings['genres']
+    loan_table.borrowers = [tuple(borrower)
+                            for borrower in strings['borrowers']]
+    loan_table._title_lookup = {
+        title: code for code, title in enumerate(loan_table.titles)}
+    loan_table._genre_lookup = {
+        genre: code for code, genre in enumerate(loan_table.genres)}
+    loan_table._borrower_lookup = {
+        borrower: code for code, borrower in enumerate(loan_table.borrowers)}
+    return loan_table, strings['errors']
+
+
+def load_loan_table(csv_filename):
+    """
+    Returns (LoanTable, errors) for a CSV file, from the snapshot if it is
+    up to date, otherwise by parsing the CSV file and writing a snapshot.
+    """
+    loaded = load_loan_table_snapshot(csv_filename)
+    if loaded is not None:
+        return loaded
+    loan_table, errors = LoanTable.from_csv(csv_filename)
+    save_loan_table_snapshot(loan_table, errors, csv_filename)
+    return loan_table, errors
+
+
+# --------------------------------------------------------------------------- #
+# Class LoanRepository, LoanedBooks with indexes for ad-hoc queries.
+
+class LoanRepository:
+    """
+    Holds LoanedBooks with indexes, so queries don't scan every loan.
+
+    Hash indexes on title, genre (case-insensitive) and the full name of
+    the loaner give O(1) lookups. A sorted index on loan date answers date
+    ranges in O(log n), and a bitmap marks the books not returned.
+    The date index is sorted once on the first query after adding loans,
+    instead of on every add.
+    """
+
+    def __init__(self, loaned_books=()):
+        self.books = []
+        self._by_title = {}
+        self._by_genre = {}
+        self._by_loaner = {}
+        # Sorted loan dates (as day ordinals) and the matching positions.
+        self._dates = []
+        self._date_positions = []
+        self._dates_sorted = True
+        self._not_returned = bytearray()
+        for book in loaned_books:
+            self.add(book)
+
+    @classmethod
+    def from_csv(cls, filename):
+        """
+        Creates a LoanRepository from a CSV file.
+
+        Returns:
+            tuple[LoanRepository, list[str]]: The repository and the rows
+            that failed validation.
+        """
+        repository = cls()
+        errors = []
+        for row in read_csv_in_chunks(filename):
+            bookloan, error = LoanedBooks.create_object_from_dict(row)
+            if error:
+                errors.append(error)
+            else:
+                repository.add(bookloan)
+        return repository, errors
+
+    def add(self, book):
+        """
+        Adds a LoanedBooks object and updates all indexes.
+        """
+        position = len(self.books)
+        self.books.append(book)
+        self._by_title.setdefault(book.book_title, []).append(position)
+        self._by_genre.setdefault(book.genre.lower(), []).append(position)
+        self._by_loaner.setdefault(
+            book.get_full_name_loaner(), []).append(position)
+
+        loan_day = book.loan_date.toordinal()
+        if self._dates and loan_day < self._dates[-1]:
+            self._dates_sorted = False
+        self._dates.append(loan_day)
+        self._date_positions.append(position)
+
+        if position % 8 == 0:
+            self._not_returned.append(0)
+        if not book.returned_on_time():
+            self._not_returned[position >> 3] |= 1 << (position & 7)
+
+    def __len__(self):
+        return len(self.books)
+
+    def _books_at(self, positions):
+        return [self.books[position] for position in positions]
+
+    def is_not_returned(self, position):
+        """
+        Checks the not returned bitmap for the book at a position.
+        """
+        return bool(self._not_returned[position >> 3] & (1 << (position & 7)))
+
+    def by_title(self, title):
+        """
+        Returns all loans of a title.
+        """
+        return self._books_at(self._by_title.get(title, ()))
+
+    def by_genre(self, genre):
+        """
+        Returns all loans in a genre.
+        """
+        return self._books_at(self._by_genre.get(genre.lower(), ()))
+
+    def by_loaner(self, full_name):
+        """
+        Returns all loans by a loaner, by full name ("Fornavn Etternavn").
+        """
+        return self._books_at(self._by_loaner.get(full_name, ()))
+
+    def _date_range_bounds(self, start, end):
+        """
+        Returns the (low, high) slice of the date index holding the loans
+        from start to end (both included).
+        """
+        if not self._dates_sorted:
+            date_index = sorted(zip(self._dates, self._date_positions))
+            self._dates = [loan_day for loan_day, _ in date_index]
+            self._date_positions = [position for _, position in date_index]
+            self._dates_sorted = True
+        return (bisect_left(self._dates, day_ordinal(start)),
+                bisect_right(self._dates, day_ordinal(end)))
+
+    def _date_range_positions(self, start, end):
+        """
+        Returns the positions of loans from start to end (both included),
+        in order of loan date.
+        """
+        low, high = self._date_range_bounds(start, end)
+        return self._date_positions[low:high]
+
+    def loaned_between(self, start, end):
+        """
+        Returns the loans from start to end (both included) by loan date.
+        """
+        return self._books_at(self._date_range_positions(start, end))
+
+    def genre_loaned_between(self, genre, start, end):
+        """
+        Returns the loans in a genre from start to end (both included).
+        Uses whichever of the genre and date indexes gives fewer loans,
+        comparing the sizes before copying any positions.
+        """
+        genre = genre.lower()
+        genre_positions = self._by_genre.get(genre, ())
+        low, high = self._date_range_bounds(start, end)
+        if len(genre_positions) < high - low:
+            start_day = day_ordinal(start)
+            end_day = day_ordinal(end)
+            books = [self.books[position] for position in genre_positions]
+            return sorted(
+                (book for book in books
+                 if start_day <= book.loan_date.toordinal() <= end_day),
+                key=lambda book: book.loan_date)
+        return [self.books[position]
+                for position in self._date_positions[low:high]
+                if self.books[position].genre.lower() == genre]
+
+    def not_returned(self):
+        """
+        Returns all books not returned, using the bitmap.
+        """
+        positions = []
+        for byte_index, byte in enumerate(self._not_returned):
+            while byte:
+                bit = byte & -byte
+                positions.append(byte_index * 8 + bit.bit_length() - 1)
+                byte ^= bit
+        return self._books_at(positions)
+
+    def loaners_with_title_out(self, title):
+        """
+        Returns the full names of everyone who has a title out.
+        """
+        return [self.books[position].get_full_name_loaner()
+                for position in self._by_title.get(title, ())
+                if self.is_not_returned(position)]
+
+
+# --------------------------------------------------------------------------- #
+# Overdue loans, using the due date of every loan.
+# The due date is loan date + loan period + extension. As in task 5B and 5D,
+# "Tilbakelevert" = "Nei" is read as the book not being handed back yet, so
+# a loan is overdue on a date if it is not returned and the due date has
+# passed.
+
+class OverdueIndex:
+    """
+    Answers overdue queries for a LoanTable for any "as of" date.
+
+    Due dates of the loans not returned are kept sorted, with prefix sums,
+    so the number of overdue loans and the total days overdue for a date
+    are found with a binary search instead of a scan of every loan.
+    """
+
+    def __init__(self, loan_table):
+        self.loan_table = loan_table
+        self.due_dates = array('l', map(
+            sum, zip(loan_table.loan_dates, loan_table.loan_periods,
+                     loan_table.extensions)))
+
+        due_index = sorted(
+            (due_date, row)
+            for row, (due_date, returned) in enumerate(
+                zip(self.due_dates, loan_table.returned))
+            if not returned)
+        self._sorted_due_dates = array('l', [due for due, _ in due_index])
+        self._sorted_rows = array('L', [row for _, row in due_index])
+        # _due_date_sums[i] is the sum of the first i sorted due dates.
+        self._due_date_sums = [0]
+        for due_date in self._sorted_due_dates:
+            self._due_date_sums.append(self._due_date_sums[-1] + due_date)
+
+    def _overdue_count(self, as_of_day):
+        """
+        Returns how many of the sorted loans are due before as_of_day.
+        """
+        return bisect_left(self._sorted_due_dates, as_of_day)
+
+    def due_date(self, row):
+        """
+        Returns the due date of a row as a date object.
+        """
+        return date.fromordinal(self.due_dates[row])
+
+    def overdue_loans(self, as_of):
+        """
+        Returns (row, days overdue) for every loan overdue on a date,
+        most overdue first. as_of is a date object or "dd/mm/yyyy".
+        """
+        as_of_day = day_ordinal(as_of)
+        count = self._overdue_count(as_of_day)
+        return [(self._sorted_rows[i], as_of_day - self._sorted_due_dates[i])
+                for i in range(count)]
+
+    def count_overdue(self, as_of):
+        """
+        Returns the number of loans overdue on a date.
+        """
+        return self._overdue_count(day_ordinal(as_of))
+
+    def total_days_overdue(self, as_of):
+        """
+        Returns the sum of days overdue for all loans overdue on a date.
+        """
+        as_of_day = day_ordinal(as_of)
+        count = self._overdue_count(as_of_day)
+        return count * as_of_day - self._due_date_sums[count]
+
+    def exposure_per_loaner(self, as_of):
+        """
+        Returns {full name: (overdue loans, total days overdue)} for
+        everyone with overdue loans on a date.
+        """
+        exposure = {}
+        for row, days_overdue in self.overdue_loans(as_of):
+            loaner = self.loan_table.get_full_name_loaner(row)
+            loans, days = exposure.get(loaner, (0, 0))
+            exposure[loaner] = (loans + 1, days + days_overdue)
+        return exposure
+
+    def daily_overdue(self, start, end):
+        """
+        Returns (date, overdue loans, total days overdue) for every day
+        from start to end (both included).
+        """
+        return [(date.fromordinal(day), self._overdue_count(day),
+                 self.total_days_overdue(date.fromordinal(day)))
+                for day in range(day_ordinal(start), day_ordinal(end) + 1)]
+
+
+# --------------------------------------------------------------------------- #
+# Aggregation engine for tasks 5A-5E.
+# Every report registers an accumulator, and all of them are updated in one
+# streaming pass over the CSV file, without keeping the rows in memory.
+
+class SumAccumulator:
+    """
+    Sums a value from every record.
+    """
+
+    def __init__(self, value):
+        self.value = value
+        self.total = 0
+
+    def add(self, record):
+        self.total += self.value(record)
+
+    def merge(self, other):
+        self.total += other.total
+
+    def get_state(self):
+        return self.total
+
+    def load_state(self, state):
+        self.total = state
+
+    def result(self):
+        return self.total
+
+
+class CountByKeyAccumulator:
+    """
+    Counts records per key, optionally only records matching "where".
+    Keys are kept in order of first appearance.
+    """
+
+    def __init__(self, key, where=None):
+        self.key = key
+        self.where = where
+        self.counts = {}
+
+    def add(self, record):
+        if self.where is None or self.where(record):
+            key = self.key(record)
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def merge(self, other):
+        for key, amount in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + amount
+
+    def get_state(self):
+        return self.counts
+
+    def load_state(self, state):
+        self.counts = dict(state)
+
+    def result(self):
+        return self.counts
+
+
+class MeanAccumulator:
+    """
+    Calculates the mean of a value from every record.
+    """
+
+    def __init__(self, value):
+        self.value = value
+        self.total = 0
+        self.count = 0
+
+    def add(self, record):
+        self.total += self.value(record)
+        self.count += 1
+
+    def merge(self, other):
+        self.total += other.total
+        self.count += other.count
+
+    def get_state(self):
+        return [self.total, self.count]
+
+    def load_state(self, state):
+        self.total, self.count = state
+
+    def result(self):
+        """
+        Returns the mean, or None if no records were added.
+        """
+        if not self.count:
+            return None
+        return self.total / self.count
+
+
+class FilterCollectAccumulator:
+    """
+    Collects a value from every record matching "where".
+    """
+
+    def __init__(self, where, value):
+        self.where = where
+        self.value = value
+        self.collected = []
+
+    def add(self, record):
+        if self.where(record):
+            self.collected.append(self.value(record))
+
+    def merge(self, other):
+        self.collected.extend(other.collected)
+
+    def get_state(self):
+        return self.collected
+
+    def load_state(self, state):
+        self.collected = list(state)
+
+    def result(self):
+        return self.collected
+
+
+class TopKAccumulator:
+    """
+    Counts records per key and returns the k most common keys.
+
+    Sorted by descending count, then alphabetically (case-insensitive).
+    All keys are returned if k is None.
+    """
+
+    def __init__(self, key, k=None):
+        self.key = key
+        self.k = k
+        self.counts = {}
+
+    def add(self, record):
+        key = self.key(record)
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def merge(self, other):
+        for key, amount in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + amount
+
+    def get_state(self):
+        return self.counts
+
+    def load_state(self, state):
+        self.counts = dict(state)
+
+    def result(self, k=None):
+        """
+        Returns a list of (key, count) tuples, for the top k if given.
+        """
+        return top_k_counts(self.counts, self.k if k is None else k)
+
+
+class CountMinSketch:
+    """
+    Approximate counts of keys in constant memory.
+
+    Every key is counted in one cell of each of "depth" rows. The estimate
+    is the smallest of those cells, so it can be too high, never too low.
+    """
+
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = array('Q', bytes(8 * width * depth))
+
+    def _cells(self, key):
+        """
+        Returns the index of the key's cell in every row.
+        blake2b is used instead of hash() so results are the same in
+        every process.
+        """
+        digest = hashlib.blake2b(key.encode('utf-8'),
+                                 digest_size=8 * self.depth).digest()
+        return [row * self.width
+                + int.from_bytes(digest[8 * row:8 * row + 8], 'little')
+                % self.width
+                for row in range(self.depth)]
+
+    def add(self, key, count=1):
+        """
+        Counts a key and returns its new estimate.
+        """
+        table = self.table
+        estimate = None
+        for cell in self._cells(key):
+            table[cell] += count
+            if estimate is None or table[cell] < estimate:
+                estimate = table[cell]
+        return estimate
+
+    def estimate(self, key):
+        """
+        Returns the estimated count of a key.
+        """
+        return min(self.table[cell] for cell in self._cells(key))
+
+    def merge(self, other):
+        for cell, amount in enumerate(other.table):
+            self.table[cell] += amount
+
+
+class TrendingTitlesAccumulator:
+    """
+    Approximate top k keys in constant memory, for unbounded streams.
+
+    Counts are kept in a CountMinSketch, and only the k keys with the
+    highest estimates are kept, in a min-heap. The heap entries are
+    replaced lazily, so stale entries are skipped when popped.
+    """
+
+    def __init__(self, key, k=10, width=2048, depth=4):
+        self.key = key
+        self.k = k
+        self.sketch = CountMinSketch(width, depth)
+        self.candidates = {}
+        self.heap = []
+
+    def add(self, record):
+        key = self.key(record)
+        self._offer(key, self.sketch.add(key))
+
+    def _offer(self, key, estimate):
+        """
+        Keeps the key if it is among the k highest estimates.
+        """
+        candidates = self.candidates
+        heap = self.heap
+        if key in candidates or len(candidates) < self.k:
+            candidates[key] = estimate
+            heapq.heappush(heap, (estimate, key))
+        else:
+            while heap[0][0] != candidates.get(heap[0][1]):
+                heapq.heappop(heap)
+            if estimate <= heap[0][0]:
+                return
+            del candidates[heapq.heapreplace(heap, (estimate, key))[1]]
+            candidates[key] = estimate
+
+        # Removes stale entries so the heap stays bounded.
+        if len(heap) > 2 * self.k + 16:
+            self.heap = [(estimate, key)
+                         for key, estimate in candidates.items()]
+            heapq.heapify(self.heap)
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+        keys = set(self.candidates) | set(other.candidates)
+        self.candidates = {}
+        self.heap = []
+        for key in keys:
+            self._offer(key, self.sketch.estimate(key))
+
+    def get_state(self):
+        return {'table': self.sketch.table.tolist(),
+                'candidates': self.candidates}
+
+    def load_state(self, state):
+        self.sketch.table = array('Q', state['table'])
+        self.candidates = dict(state['candidates'])
+        self.heap = [(estimate, key)
+                     for key, estimate in self.candidates.items()]
+        heapq.heapify(self.heap)
+
+    def result(self, k=None):
+        """
+        Returns a list of (key, estimated count) tuples, sorted the same
+        way as TopKAccumulator.
+        """
+        return top_k_counts(self.candidates, self.k if k is None else k)
+
+
+def top_k_counts(counts, k=None):
+    """
+    Returns the k highest counts as (key, count) tuples, sorted by
+    descending count and then case-insensitive key. All if k is None.
+    """
+    if k is None:
+        return sorted(counts.items(), key=count_sort_key)
+    return heapq.nsmallest(k, counts.items(), key=count_sort_key)
+
+
+def count_sort_key(item):
+    """
+    Sort key for (key, count): descending count, then key ignoring case.
+    """
+    return -item[1], item[0].lower()
+
+
+class LoanReportEngine(LoanReports):
+    """
+    Runs several reports over the loans in a single pass.
+
+    Reports are registered by name with an accumulator. Every valid row is
+    passed to all accumulators as a LoanRecord. Rows failing validation are
+    counted in "error_count" and streamed to the "error_sink" (CsvErrorSink
+    or ErrorSpill), if given, so no errors are kept in memory.
+
+    The LoanReports methods return the results of an engine made by
+    create_task_report_engine.
+    """
+
+    def __init__(self, error_sink=None):
+        self.error_sink = error_sink
+        self.reports = {}
+        self.error_count = 0
+        self.rows_handled = 0
+        self.lines_read = 0
+
+    def register(self, name, accumulator):
+        """
+        Registers an accumulator under a report name and returns it.
+        """
+        self.reports[name] = accumulator
+        return accumulator
+
+    def add(self, record):
+        """
+        Passes one LoanRecord to every registered accumulator.
+        """
+        for accumulator in self.reports.values():
+            accumulator.add(record)
+        self.rows_handled += 1
+
+    def consume(self, numbered_rows):
+        """
+        Validates (line number, row) pairs and adds the valid rows.
+        """
+        for line_number, row in numbered_rows:
+            self.lines_read = line_number
+            try:
+                record = parse_loan_row(row)
+            except ValueError as e:
+                self.error_count += 1
+                if self.error_sink is not None:
+                    self.error_sink.add(line_number, row, e)
+                continue
+            self.add(record)
+        return self
+
+    def run(self, filename):
+        """
+        Streams the CSV file through all accumulators.
+        """
+        return self.consume(read_csv_in_chunks(filename,
+                                               with_line_numbers=True))
+
+    def merge(self, other):
+        """
+        Merges the results of an engine that read the rows after this one.
+        """
+        for name, accumulator in self.reports.items():
+            accumulator.merge(other.reports[name])
+        self.error_count += other.error_count
+        self.rows_handled += other.rows_handled
+        self.lines_read += other.lines_read
+
+    def get_state(self):
+        """
+        Returns the results so far as JSON serializable data.
+        """
+        return {
+            'reports': {name: accumulator.get_state()
+                        for name, accumulator in self.reports.items()},
+            'error_count': self.error_count,
+            'rows_handled': self.rows_handled,
+            'lines_read': self.lines_read,
+        }
+
+    def load_state(self, state):
+        """
+        Restores results saved with get_state.
+        """
+        for name, accumulator in self.reports.items():
+            accumulator.load_state(state['reports'][name])
+        self.error_count = state['error_count']
+        self.rows_handled = state['rows_handled']
+        self.lines_read = state['lines_read']
+
+    def result(self, name):
+        """
+        Returns the result of a registered report.
+        """
+        return self.reports[name].result()
+
+    def results(self):
+        """
+        Returns the results of all reports as a dict.
+        """
+        return {name: accumulator.result()
+                for name, accumulator in self.reports.items()}
+
+    def total_extended(self):
+        """
+        Returns the result of report 5A.
+        """
+        return self.result('5A')
+
+    def count_genres_not_returned(self):
+        """
+        Returns the result of report 5B.
+        """
+        return self.result('5B')
+
+    def average_loan_length(self):
+        """
+        Returns the result of report 5C.
+        """
+        return self.result('5C')
+
+    def not_returned_loans(self):
+        """
+        Returns the result of report 5D.
+        """
+        return self.result('5D')
+
+    def most_loaned(self, top_k=None):
+        """
+        Returns the result of report 5E, for the top k if given.
+        """
+        return self.reports['5E'].result(top_k)
+
+
+# Functions used by the accumulators for tasks 5A-5E.
+# Module level functions (instead of lambdas) so they can be pickled.
+def loan_extension(record):
+    return record.extended
+
+
+def loan_genre(record):
+    return record.genre
+
+
+def loan_total_period(record):
+    return record.loan_period + record.extended
+
+
+def loan_not_returned(record):
+    return not record.returned
+
+
+def loan_title(record):
+    return record.book_title
+
+
+def loan_title_and_loaner(record):
+    return (f'Book: {record.book_title},'
+            f' Loaner: {record.first_name} {record.last_name}')
+
+
+def create_task_report_engine(top_k=None, approximate_top_k=False,
+                              error_sink=None):
+    """
+    Creates a LoanReportEngine with the reports for tasks 5A-5E.
+
+    Args:
+        top_k (int, optional): Only keep the top k books for task 5E.
+        approximate_top_k (bool): Use a count-min sketch for task 5E, so
+            memory stays constant regardless of the number of titles.
+        error_sink (CsvErrorSink, optional): Stream errors to this sink.
+    """
+    engine = LoanReportEngine(error_sink)
+    engine.register('5A', SumAccumulator(loan_extension))
+    engine.register('5B', CountByKeyAccumulator(
+        loan_genre, where=loan_not_returned))
+    engine.register('5C', MeanAccumulator(loan_total_period))
+    engine.register('5D', FilterCollectAccumulator(
+        loan_not_returned, loan_title_and_loaner))
+    if approximate_top_k:
+        engine.register('5E', TrendingTitlesAccumulator(
+            loan_title, k=top_k or 10))
+    else:
+        engine.register('5E', TopKAccumulator(loan_title, k=top_k))
+    return engine
+
+
+def aggregate_csv_byte_range(filename, fieldnames, start, end, spill_file):
+    """
+    Worker for run_task_reports_in_parallel. Streams the rows of one byte
+    range through the reports for tasks 5A-5E and returns the engine with
+    partial results. Errors are written to "spill_file", with line numbers
+    counted from the start of the range.
+    """
+    with ErrorSpill(spill_file) as error_spill:
+        engine = create_task_report_engine(error_sink=error_spill)
+        engine.consume(read_csv_lines_in_range(filename, fieldnames,
+                                               start, end))
+    engine.error_sink = None  # Not sent back to the main process
+
+    # Counted from the file, since empty lines at the end yield no rows.
+    with open(filename, 'rb') as csvfile:
+        csvfile.seek(end - 1)
+        unterminated = csvfile.read(1) != b'\n'
+    engine.lines_read = count_newlines(filename, start, end) + unterminated
+    return engine
+
+
+def run_task_reports_in_parallel(filename, workers=None, error_sink=None,
+                                 range_size=PARALLEL_RANGE_SIZE):
+    """
+    Runs the reports for tasks 5A-5E with the CSV file split into byte
+    ranges of about range_size bytes, streamed, parsed and validated in
+    separate processes. Workers stream their range instead of reading it
+    into memory, and with many more ranges than workers, a slow range
+    doesn't keep the other workers waiting.
+
+    The partial results are merged in file order, and the errors of every
+    range are passed on to "error_sink" as its result is merged, so the
+    results, errors and error line numbers are the same as a serial run.
+    """
+    workers = workers or os.cpu_count() or 1
+    fieldnames, byte_ranges = split_csv_into_byte_ranges(filename,
+                                                         range_size)
+
+    engine = create_task_report_engine()
+    engine.lines_read = 1  # The header
+    with tempfile.TemporaryDirectory() as spill_dir:
+        spill_files = [os.path.join(spill_dir, f'{i}.errors')
+                       for i in range(len(byte_ranges))]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            partial_engines = executor.map(
+                aggregate_csv_byte_range,
+                [filename] * len(byte_ranges),
+                [fieldnames] * len(byte_ranges),
+                *zip(*byte_ranges), spill_files)
+            for partial_engine, spill_file in zip(partial_engines,
+                                                  spill_files):
+                if error_sink is not None:
+                    replay_error_spill(spill_file, error_sink,
+                                       engine.lines_read)
+                os.remove(spill_file)
+                engine.merge(partial_engine)
+    return engine
+
+
+# --------------------------------------------------------------------------- #
+# Incremental reports for tasks 5A-5E.
+# The CSV file only grows by appending rows, so the byte offset read so far
+# and the results are saved to a state file, and the next run only reads
+# the new rows. A checksum of the part already read detects if the file was
+# truncated or rewritten, which falls back to reading the whole file.
+# The errors of all runs are kept in an ErrorSpill file next to the state.
+# A last row without a newline may still be being written, so it is kept
+# out of the saved results: it is read on every run, or taken from the
+# "tail" of the state while its length and checksum are unchanged.
+
+STATE_FILE_VERSION = 3
+CHECKSUM_BLOCK_SIZE = 64 * 1024
+
+
+def checksum_read_part(filename, offset):
+    """
+    Returns a checksum of the start and the end of the first "offset"
+    bytes of the file, which covers the header and the last rows read.
+    """
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as csvfile:
+        digest.update(csvfile.read(min(offset, CHECKSUM_BLOCK_SIZE)))
+        csvfile.seek(max(0, offset - CHECKSUM_BLOCK_SIZE))
+        digest.update(csvfile.read(min(offset, CHECKSUM_BLOCK_SIZE)))
+    return digest.hexdigest()
+
+
+def find_end_of_last_line(csvfile, file_size):
+    """
+    Returns the offset after the last newline in a binary file, so a row
+    still being appended is kept out of the saved state.
+    """
+    position = file_size
+    while position > 0:
+        block_start = max(0, position - CHECKSUM_BLOCK_SIZE)
+        csvfile.seek(block_start)
+        block = csvfile.read(position - block_start)
+        newline = block.rfind(b'\n')
+        if newline != -1:
+            return block_start + newline + 1
+        position = block_start
+    return 0
+
+
+def count_newlines(filename, start, end):
+    """
+    Counts the newlines between the byte offsets start and end.
+    """
+    newlines = 0
+    with open(filename, 'rb') as csvfile:
+        csvfile.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = csvfile.read(min(remaining, CHECKSUM_BLOCK_SIZE))
+            if not block:
+                break
+            newlines += block.count(b'\n')
+            remaining -= len(block)
+    return newlines
+
+
+# Generator to read the complete lines in a byte range of a CSV file.
+def read_csv_lines_in_range(filename, fieldnames, start, end):
+    """
+    Yields (line number within the range, row) for the rows between the
+    byte offsets start and end, decoded the same way as read_csv_in_chunks.
+    """
+    with open(filename, 'rb') as csvfile:
+        csvfile.seek(start)
+        remaining = end - start
+
+        def lines():
+            nonlocal remaining
+            for line in csvfile:
+                if remaining <= 0:
+                    break
+                remaining -= len(line)
+                yield line.decode('utf-8')
+
+        csv_reader = csv.DictReader(lines(), fieldnames=fieldnames)
+        for row in csv_reader:
+            yield csv_reader.line_num, row
+
+
+def load_report_state(filename, state_file):
+    """
+    Loads the saved state for the CSV file.
+    Returns None if there is no state, or if the file has been truncated
+    or rewritten since the state was saved.
+    """
+    try:
+        with open(state_file, 'r', encoding='utf-8') as state_reader:
+            state = json.load(state_reader)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    if state.get('version') != STATE_FILE_VERSION:
+        return None
+    if os.path.getsize(filename) < state['offset']:
+        return None
+    if checksum_read_part(filename, state['offset']) != state['checksum']:
+        return None
+    return state
+
+
+def save_report_state(state_file, state):
+    """
+    Saves the state to a temporary file and replaces the old state with it,
+    so an interrupted run never leaves a broken state file.
+    """
+    temporary_file = f'{state_file}.tmp'
+    with open(temporary_file, 'w', encoding='utf-8') as state_writer:
+        json.dump(state, state_writer, ensure_ascii=False)
+    os.replace(temporary_file, state_file)
+
+
+def run_task_reports_incrementally(filename, state_file=None,
+                                   error_sink=None):
+    """
+    Runs the reports for tasks 5A-5E over the rows appended since the last
+    run, and saves the results to the state file. The results include a
+    last row without a newline, the same as a full run.
+
+    Args:
+        filename (str): The CSV file.
+        state_file (str, optional): Defaults to "<filename>.state.json".
+        error_sink (CsvErrorSink, optional): Gets the errors of the whole
+            file, read back from the error spill file.
+    Returns:
+        LoanReportEngine: The results for the whole file.
+    """
+    state_file = state_file or f'{filename}.state.json'
+    error_log = f'{state_file}.errors'
+    engine = create_task_report_engine()
+    state = load_report_state(filename, state_file)
+
+    logged = os.path.getsize(error_log) if os.path.exists(error_log) else 0
+    if state is not None and logged < state['error_log_size']:
+        state = None  # The errors of earlier runs are lost, so start over
+    if state is None:
+        with open(filename, 'rb') as csvfile:
+            header = csvfile.readline()
+            offset = csvfile.tell()
+        fieldnames = next(csv.reader([header.decode('utf-8')]))
+        engine.lines_read = 1  # The header
+    else:
+        offset = state['offset']
+        fieldnames = state['fieldnames']
+        engine.load_state(state['engine'])
+        if logged > state['error_log_size']:
+            # Errors from a run that was stopped before saving its state.
+            os.truncate(error_log, state['error_log_size'])
+
+    with open(filename, 'rb') as csvfile:
+        file_size = os.fstat(csvfile.fileno()).st_size
+        end = max(offset, find_end_of_last_line(csvfile, file_size))
+        csvfile.seek(end)
+        tail = csvfile.read(file_size - end)
+
+    with ErrorSpill(error_log, append=state is not None) as error_spill:
+        new_rows = create_task_report_engine(error_sink=error_spill)
+        new_rows.consume(
+            (engine.lines_read + line_number, row) for line_number, row
+            in read_csv_lines_in_range(filename, fieldnames, offset, end))
+    new_rows.lines_read = count_newlines(filename, offset, end)
+    engine.merge(new_rows)
+
+    tail_log = f'{error_log}.tail'
+    tail_state = None
+    if tail:
+        tail_checksum = hashlib.sha256(tail).hexdigest()
+        saved_tail = state and state.get('tail')
+        tail_rows = create_task_report_engine()
+        if (saved_tail and end == offset
+                and saved_tail['length'] == len(tail)
+                and saved_tail['checksum'] == tail_checksum
+                and os.path.exists(tail_log)):
+            tail_rows.load_state(saved_tail['engine'])
+        else:
+            with ErrorSpill(tail_log) as error_spill:
+                tail_rows.error_sink = error_spill
+                tail_rows.consume(
+                    (engine.lines_read + line_number, row)
+                    for line_number, row in read_csv_lines_in_range(
+                        filename, fieldnames, end, file_size))
+            tail_rows.error_sink = None
+            tail_rows.lines_read = 1
+        tail_state = {'length': len(tail), 'checksum': tail_checksum,
+                      'engine': tail_rows.get_state()}
+
+    save_report_state(state_file, {
+        'version': STATE_FILE_VERSION,
+        'offset': end,
+        'checksum': checksum_read_part(filename, end),
+        'fieldnames': fieldnames,
+        'error_log_size': os.path.getsize(error_log),
+        'engine': engine.get_state(),
+        'tail': tail_state,
+    })
+    if error_sink is not None:
+        replay_error_spill(error_log, error_sink)
+    if tail:
+        engine.merge(tail_rows)
+        if error_sink is not None:
+            replay_error_spill(tail_log, error_sink)
+    elif os.path.exists(tail_log):
+        os.remove(tail_log)
+    return engine
+
+
+# --------------------------------------------------------------------------- #
+# Streaming sink for rows that fail validation.
+# Errors are written to the error file in batches while the CSV file is
+# read, instead of being kept in memory until the end.
+
+class TooManyCsvErrors(Exception):
+    """
+    Raised when a CsvErrorSink gets more errors than "max_errors".
+    """
+
+
+class CsvErrorSink:
+    """
+    Writes errors from reading the CSV file to an error file as they happen.
+
+    The file is only created when the first error is written. In "text"
+    format every line is the same as in create_object_from_dict. In "jsonl"
+    format every line is a JSON object with the line number, error type,
+    message and row. Only the counts per error type are kept in memory.
+
+    Args:
+        error_file (str): The file to write errors to.
+        error_format (str): "text" or "jsonl".
+        batch_size (int): Number of errors buffered before writing.
+        max_errors (int, optional): Raise TooManyCsvErrors after this
+            many errors.
+    """
+
+    def __init__(self, error_file='errors_from_csv.txt', error_format='text',
+                 batch_size=1000, max_errors=None):
+        if error_format not in ('text', 'jsonl'):
+            raise ValueError('"error_format" must be "text" or "jsonl"')
+        self.error_file = error_file
+        self.error_format = error_format
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.total = 0
+        self.counts = {}
+        self._buffer = []
+        self._writer = None
+
+    def add(self, line_number, row, error):
+        """
+        Records an error for a row.
+        The error type is taken from LoanValidationError, otherwise "other".
+        """
+        kind = getattr(error, 'kind', 'other')
+        self.total += 1
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+
+        if self.error_format == 'jsonl':
+            self._buffer.append(json.dumps({
+                'line': line_number, 'type': kind,
+                'error': str(error), 'row': row}, ensure_ascii=False))
+        else:
+            self._buffer.append(f'Error on row: {row} | Error: {error}')
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+        if self.max_errors is not None and self.total > self.max_errors:
+            self.close()
+            raise TooManyCsvErrors(
+                f'More than {self.max_errors} errors, stopped at line '
+                f'{line_number}. Details in {self.error_file}')
+
+    def flush(self):
+        """
+        Writes the buffered errors to the error file.
+        """
+        if not self._buffer:
+            return
+        if self._writer is None:
+            self._writer = open(self.error_file, 'w', encoding='utf-8')
+        self._writer.write('\n'.join(self._buffer) + '\n')
+        self._writer.flush()
+        self._buffer.clear()
+
+    def close(self):
+        """
+        Writes the remaining errors and closes the error file.
+        """
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def print_summary(self):
+        """
+        Prints the number of errors, if any, and where to find them.
+        """
+        if self.total:
+            print(f'Found {self.total} Errors. Details in {self.error_file}')
+
+
+class ErrorSpill:
+    """
+    Writes errors to a binary file, for a CsvErrorSink in another process
+    or a later run. Every error is pickled as (line number, row, message,
+    error type), so rows are read back exactly as they were.
+
+    Args:
+        spill_file (str): The file to write errors to.
+        append (bool): Add to the errors already in the file.
+    """
+
+    def __init__(self, spill_file, append=False):
+        self.spill_file = spill_file
+        self.total = 0
+        self._writer = open(spill_file, 'ab' if append else 'wb')
+
+    def add(self, line_number, row, error):
+        """
+        Records an error for a row, the same way as CsvErrorSink.add.
+        """
+        self.total += 1
+        pickle.dump((line_number, row, str(error),
+                     getattr(error, 'kind', 'other')), self._writer)
+
+    def close(self):
+        """
+        Closes the spill file.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def replay_error_spill(spill_file, error_sink, line_offset=0):
+    """
+    Adds the errors in a spill file to an error sink, in the order they
+    were written, with "line_offset" added to their line numbers.
+    """
+    try:
+        reader = open(spill_file, 'rb')
+    except FileNotFoundError:
+        return
+    with reader:
+        while True:
+            try:
+                line_number, row, message, kind = pickle.load(reader)
+            except EOFError:
+                return
+            error_sink.add(line_offset + line_number, row,
+                           LoanValidationError(message, kind))
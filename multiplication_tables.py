@@ -0,0 +1,133 @@
+import os
+
+# --------------------------------------------------------------------------- #
+"""
+Multiplication tables for many numbers and any range, for task 1C.
+
+table_lines yields the lines one at a time ('3 * 1', or '3 * 1 = 3' with
+the product). table_chunks joins the lines into large strings, and
+write_tables writes those chunks as bytes straight to a file descriptor
+or binary file, without a print per line.
+"""
+
+CHUNK_LINES = 65_536  # Lines joined per chunk
+
+
+# --------------------------------------------------------------------------- #
+# Lines
+
+def table_lines(numbers, first=1, last=10, with_product=False):
+    """
+    Yields the lines of the multiplication tables of numbers, lazily.
+
+    Args:
+        numbers (Iterable[int]): The numbers to make tables for.
+        first (int): The first factor of every table.
+        last (int): The last factor of every table, included.
+        with_product (bool): Adds ' = <product>' to every line.
+    Yields:
+        str: '<number> * <factor>' lines, table after table.
+    """
+    for number in numbers:
+        prefix = f'{number} * '
+        if with_product:
+            for factor in range(first, last + 1):
+                yield f'{prefix}{factor} = {number * factor}'
+        else:
+            for factor in range(first, last + 1):
+                yield f'{prefix}{factor}'
+
+
+def _table_block(number, start, stop, with_product):
+    """
+    Returns the lines of one table for the factors start..stop-1, joined
+    by newlines.
+    """
+    prefix = f'{number} * '
+    factors = range(start, stop)
+    if not with_product:
+        return '\n'.join([f'{prefix}{factor}' for factor in factors])
+    # The products are a range too, stepping by the number.
+    products = (range(number * start, number * stop, number) if number
+                else [0] * len(factors))
+    return '\n'.join([f'{prefix}{factor} = {product}'
+                      for factor, product in zip(factors, products)])
+
+
+def _table_template(first, last, with_product):
+    """
+    Returns a format string for a whole table, taking the number as {0}
+    and the products as {1}, {2}, ...
+    """
+    if with_product:
+        return '\n'.join(f'{{0}} * {factor} = {{{i}}}' for i, factor
+                         in enumerate(range(first, last + 1), start=1))
+    return '\n'.join(f'{{0}} * {factor}' for factor in range(first, last + 1))
+
+
+def table_chunks(numbers, first=1, last=10, with_product=False,
+                 chunk_lines=CHUNK_LINES):
+    """
+    Yields the lines of table_lines joined into chunks of about
+    chunk_lines lines, each ending with a newline.
+
+    Tables that fit in a chunk are made from one format string per call,
+    so a table costs one format instead of one per line. Larger tables
+    are split into blocks of chunk_lines lines.
+    """
+    table_size = last - first + 1
+    if table_size <= 0:
+        return
+    template = (_table_template(first, last, with_product)
+                if table_size <= chunk_lines else None)
+    pieces = []
+    lines_in_chunk = 0
+    for number in numbers:
+        if template is None:
+            for start in range(first, last + 1, chunk_lines):
+                stop = min(start + chunk_lines, last + 1)
+                yield _table_block(number, start, stop, with_product) + '\n'
+            continue
+        if with_product:
+            products = (range(number * first, number * (last + 1), number)
+                        if number else [0] * table_size)
+            pieces.append(template.format(number, *products))
+        else:
+            pieces.append(template.format(number))
+        lines_in_chunk += table_size
+        if lines_in_chunk >= chunk_lines:
+            yield '\n'.join(pieces) + '\n'
+            pieces = []
+            lines_in_chunk = 0
+    if pieces:
+        yield '\n'.join(pieces) + '\n'
+
+
+# --------------------------------------------------------------------------- #
+# Output
+
+def write_tables(output, numbers, first=1, last=10, with_product=False,
+                 chunk_lines=CHUNK_LINES):
+    """
+    Writes multiplication tables as UTF-8 bytes, a chunk at a time.
+
+    Args:
+        output (int | BinaryIO): A file descriptor (like 1 for stdout),
+            written with os.write, or a binary file.
+        numbers, first, last, with_product: See table_lines.
+        chunk_lines (int): Lines per write.
+    Returns:
+        int: The number of bytes written.
+    """
+    written = 0
+    for chunk in table_chunks(numbers, first, last, with_product,
+                              chunk_lines):
+        data = chunk.encode()
+        if isinstance(output, int):
+            view = memoryview(data)
+            while view:
+                view = view[os.write(output, view):]
+        else:
+            output.write(data)
+        written += len(data)
+    return written
@@ -1,4 +1,6 @@
-from functools import wraps
+from instrumentation import logging_current_task
+from multiplication_tables import table_lines
+from summation import range_sum, sum_to
 # --------------------------------------------------------------------------- #
 """
 A. Lag et program som ber brukeren om å skrive inn et positivt heltall (int) 
@@ -34,23 +36,29 @@ Programmet skal ta utgangspunkt i følgende liste:
 """
 
 # --------------------------------------------------------------------------- #
-# Utility here:
+# Tasks 1A
 
-# Decorator to log what task I'm working on.
-def logging_current_task(task_id):
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            print(f'Now running task: {task_id}')
-            result = func(*args, **kwargs)
-            print()
-            return result
-        return wrapper
-    return decorator
+def check_integer(value, name='number'):
+    """
+    Raises ValueError if value is not an int (bools are not accepted), the
+    same input the interactive tasks get from int(input()).
+    """
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f'The {name} must be an integer, not {value!r}.')
 
 
-# --------------------------------------------------------------------------- #
-# Tasks 1A
+def sum_numbers(number: int) -> int:
+    """
+    Returns the sum of all numbers from 1 to "number".
+
+    Raises:
+        ValueError: If number is not a positive integer.
+    """
+    check_integer(number)
+    if number < 1:
+        raise ValueError('The number must be a positive integer: [number > 0]')
+    return sum_to(number)
+
 
 @logging_current_task('1A')
 def tasks_1a():
@@ -61,30 +69,35 @@ def tasks_1a():
     Ensures the input is valid (positive integer greater than 1).
     It is locked from using negative numbers, as per the task description.
 
-    Calculates the sum using a for loop and prints the result.
+    Calculates the sum with the formula for arithmetic series, so large
+    numbers take no longer than small ones, and prints the result.
     """
     print('Summarising numbers from 1 to given number')
     try:
         sum_input = int(input('Wanted nr: '))
-        if sum_input < 1:
-            print('The number must bea positive integer: [number > 0]')
-            return
-        # Calculating sum with a for loop
-        total_sum = 0
-        for i in range(1, sum_input + 1):
-            total_sum += i
-        print(f'The sum of numbers from 1 to {sum_input} is {total_sum}')
     except ValueError:
         print('Invalid input. Not a valid positive integer.')
+        return
+    try:
+        total_sum = sum_numbers(sum_input)
+    except ValueError as e:
+        print(e)
+        return
+    print(f'The sum of numbers from 1 to {sum_input} is {total_sum}')
 
 
-# A, looped but not for-loop
-def sum_numbers_with_builtin():
+# A, with range_sum
+def sum_numbers_with_range_sum():
     """
-    This is the same as "tasks1_a" but done with builtin
+    This is the same as "tasks1_a" but done with "range_sum" from
+    summation, which also handles a start, step, powers and a modulus.
     """
     sum_input = int(input('Write a positive integer: '))
-    return sum(range(1, sum_input + 1))
+    return range_sum(1, sum_input + 1)
+
+
+# The old name, from when this used the builtin sum.
+sum_numbers_with_builtin = sum_numbers_with_range_sum
 
 
 # --------------------------------------------------------------------------- #
@@ -131,6 +144,14 @@ class Sentences:
                     f"and they are made up of {own_lenght} characters")
 
 
+def compare_sentences(sentence_1: str, sentence_2: str) -> str:
+    """
+    Returns which of two sentences is the longest, as in task 1B.
+    """
+    return Sentences(sentence_1, 'Sentence 1').compare_sentence_length(
+        Sentences(sentence_2, 'Sentence 2'))
+
+
 @logging_current_task('1B')
 def tasks_1b():
     """
@@ -141,16 +162,28 @@ def tasks_1b():
     Prints which sentence is longer or if they are of equal length.
     """
     print('Compare the length of two sentences:')
-    string_one = Sentences(input('Enter the first sentence: '),
-                           'Sentence 1')
-    string_two = Sentences(input('Sentence 2 for comparison: '),
-                           'Sentence 2')
-    print(string_one.compare_sentence_length(string_two))
+    sentence_1 = input('Enter the first sentence: ')
+    sentence_2 = input('Sentence 2 for comparison: ')
+    print(compare_sentences(sentence_1, sentence_2))
 
 
 # --------------------------------------------------------------------------- #
 # Tasks 1C
 
+def multiplication_table(number: int) -> list[str]:
+    """
+    Returns the lines of the multiplication table of task 1C. For many
+    numbers or large tables, use multiplication_tables instead.
+
+    Raises:
+        ValueError: If number is not a positive integer.
+    """
+    check_integer(number)
+    if number < 1:
+        raise ValueError('The number must be a positive integer.')
+    return list(table_lines([number]))
+
+
 @logging_current_task('1C')
 def tasks_1c():
     """
@@ -167,18 +200,40 @@ def tasks_1c():
     """
     try:
         number = int(input('Enter number for it\'s multiplication table: '))
-        if number < 1:
-            print('The number must be a positive integer.')
-            return
-        for i in range(1,11):
-            print(f'{number} * {i}')
     except ValueError:
         print('Invalid input. Not a valid positive integer.')
+        return
+    try:
+        print('\n'.join(multiplication_table(number)))
+    except ValueError as e:
+        print(e)
 
 
 # --------------------------------------------------------------------------- #
 # Tasks 1D
 
+FRUITS = ['eple', 'banan', 'appelsin', 'drue', 'kiwi']
+
+
+def swap_fruits(index_1: int, index_2: int, fruits=None) -> list[str]:
+    """
+    Returns a copy of the fruits (FRUITS by default) with two elements
+    swapped, as in task 1D.
+
+    Raises:
+        ValueError: If an index is not an integer or the indexes are the
+            same.
+        IndexError: If an index is not in the list.
+    """
+    check_integer(index_1, 'index')
+    check_integer(index_2, 'index')
+    fruits = list(FRUITS if fruits is None else fruits)
+    if index_1 == index_2:
+        raise ValueError('Can\'t swap the same indexes.')
+    fruits[index_1], fruits[index_2] = fruits[index_2], fruits[index_1]
+    return fruits
+
+
 @logging_current_task('1D')
 def tasks_1d():
     """
@@ -191,23 +246,22 @@ def tasks_1d():
     Swaps the elements at the specified indexes and prints the updated list.
     Prints an error message if the indexes are invalid.
     """
-    fruits = ['eple', 'banan', 'appelsin', 'drue', 'kiwi']
+    fruits = FRUITS
     print(f'The current list of fruits: {fruits}')
     print(f'Enter two indexes to swap [0 to {len(fruits) - 1}].')
 
     try:
         nr1 = int(input('Index 1: '))
         nr2 = int(input('Index 2: '))
-        if nr1 == nr2:
-            print('Can\'t swap the same indexes.')
-            return
-        fruits[nr1], fruits[nr2] = fruits[nr2], fruits[nr1]
-        print(f'The updated list after swapping: {fruits}')
-
-    except IndexError:
-        print('One or more indexes are invalid.')
     except ValueError:
         print('Invalid input. Not an integer.')
+        return
+    try:
+        print(f'The updated list after swapping: {swap_fruits(nr1, nr2)}')
+    except IndexError:
+        print('One or more indexes are invalid.')
+    except ValueError as e:
+        print(e)
 
 
 # --------------------------------------------------------------------------- #
@@ -1,5 +1,5 @@
-from datetime import datetime
-from functools import wraps
+from date_parsing import is_valid_date
+from instrumentation import logging_current_task
 
 # --------------------------------------------------------------------------- #
 """
@@ -30,42 +30,22 @@ som den i oppgave 2B, men sortert på navn.
     ['Anna', 25, 'Bjørn', 30, 'Cecilie', 28, 'Tor', 24]
 """
 
-# --------------------------------------------------------------------------- #
-# Utility used for this task and subtasks
-
-# The Decorator is contained within the actual task-file instead
-# of being imported to show it being used.
-# Decorator to log what task is currently running.
-def logging_current_task(task_id):
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            print(f'Now running task: {task_id}')
-            result = func(*args, **kwargs)
-            print()
-            return result
-        return wrapper
-    return decorator
-
-
 # --------------------------------------------------------------------------- #
 # Task 2A
 
 @logging_current_task('2A')
 def task_2a() -> bool:
     """
-    Validates a date input using the "datetime.strptime" function.
+    Validates a date input using the shared "is_valid_date" function.
     """
     print('Please type in a date in the format "dd/mm/yyyy"')
     date_str = input("date: ")
-    try:
-        datetime.strptime(date_str, '%d/%m/%Y')
+    if is_valid_date(date_str):
         print(f"{date_str} is a valid date.")
         return True
-    except ValueError:
-        print(f'Unvalid data for date given. '
-              f'Expected format for date: [dd/mm/yyyy]')
-        return False
+    print(f'Unvalid data for date given. '
+          f'Expected format for date: [dd/mm/yyyy]')
+    return False
 
 
 # --------------------------------------------------------------------------- #
@@ -182,7 +162,7 @@ def task_2d(name_age_dict: dict[str, int])-> (
 
 # --------------------------------------------------------------------------- #
 # Task 2E
-@logging_current_task
+@logging_current_task('2E')
 def task_2e(name_age_dict: dict) -> list:
     """
     Flattens a dictionary into a list sorted by name.
@@ -1,5 +1,7 @@
-from functools import wraps
-from datetime import datetime
+from colours import HEX_BYTES
+from date_parsing import days_between
+from instrumentation import logging_current_task
+from ipv4 import is_valid_ipv4
 
 # --------------------------------------------------------------------------- #
 """
@@ -40,48 +42,29 @@ Oppgave:
     red, blue eller green parametere har ugyldig verdi.
 """
 
-# --------------------------------------------------------------------------- #
-# The Decorator is contained within the actual task-file instead
-# of being imported to show it being used.
-# Decorator to log what task is currently running.
-def logging_current_task(task_id):
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            print(f'Now running task: {task_id}')
-            result = func(*args, **kwargs)
-            return result
-        return wrapper
-    return decorator
-
-
 # --------------------------------------------------------------------------- #
 # Task 3 A
-@logging_current_task('3A')
+@logging_current_task('3A', blank_line=False)
 def task_3a(ip_str: str)->bool:
     """
     Validates if the input string is a valid IPv4 address.
+    For many addresses, use parse_ipv4_batch in ipv4 instead.
 
     Args:
         ip_str (str): The input string.
     Returns:
         bool: True if the string is a valid IPv4 address, False otherwise.
     """
-    separated_ip = ip_str.split('.')
-    if len(separated_ip) != 4:
-        return False
-    for i in separated_ip:
-        if not i.isdigit() or not 0 <= int(i) <=255:
-            return False
-    return True
+    return is_valid_ipv4(ip_str)
 
 
 # --------------------------------------------------------------------------- #
 # Task 3B
-@logging_current_task('3B')
+@logging_current_task('3B', blank_line=False)
 def task_3b(date_1: str, date_2: str) -> str | None:
     """
     Calculates the number of days between two dates.
+    For many pairs of dates, use date_differences in date_parsing instead.
 
     Args:
         date_1 (str): First date in format 'dd/mm/yyyy'.
@@ -91,21 +74,21 @@ def task_3b(date_1: str, date_2: str) -> str | None:
         None: If any date is invalid.
     """
     try:
-        date1 = datetime.strptime(date_1, '%d/%m/%Y')
-        date2 = datetime.strptime(date_2, '%d/%m/%Y')
+        days = days_between(date_1, date_2)
     except ValueError as e:
         print(f"Invalid format for date(s). Expected: [dd/mm/yyyy].")
         return None
 
-    return f'{abs(date1 - date2).days} dager'
+    return f'{days} dager'
 
 
 # --------------------------------------------------------------------------- #
 # Task 3C
-@logging_current_task('3C')
+@logging_current_task('3C', blank_line=False)
 def rgb_to_hex(r: int, g: int, b: int) -> str | None:
     """
     Converts RGB values to a HEX color code.
+    For palettes and pixel buffers, use the batch functions in colours.
 
     Args:
         r (int): Red (0-255).
@@ -129,7 +112,7 @@ def rgb_to_hex(r: int, g: int, b: int) -> str | None:
         print('RGB numbers must be between 0-255')
         return None
 
-    return f'#{r:02X}{g:02X}{b:02X}'
+    return '#' + HEX_BYTES[r] + HEX_BYTES[g] + HEX_BYTES[b]
 
 
 # --------------------------------------------------------------------------- #
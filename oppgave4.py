@@ -1,7 +1,13 @@
-from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 import os
 import random as rd
 import string
+import time
+
+from file_sorter import (SortingWatcher, is_empty_folder, resume_moves,
+                         rollback_moves, sort_files)
+from instrumentation import logging_current_task
 
 os.chdir(os.path.dirname(os.path.realpath(__file__)))
 # --------------------------------------------------------------------------- #
@@ -28,21 +34,6 @@ sorterer dem i undermapper basert på filtype:
 # --------------------------------------------------------------------------- #
 # Utility for this task and sub-tasks
 
-# The Decorator is contained within the actual task-file instead
-# of being imported to show it being used.
-# Decorator to log what task is currently running.
-def logging_current_task(task_id):
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            print(f'Now running task: {task_id}')
-            result = func(*args, **kwargs)
-            print()
-            return result
-        return wrapper
-    return decorator
-
-
 # Function to set filepath and subfolder
 def set_file_path(filename, subfolder=None):
     """
@@ -62,6 +53,10 @@ def set_file_path(filename, subfolder=None):
     return os.path.join(base_path, filename)
 
 
+# File types used by task 4A.
+FILE_TYPES = ('.txt', '.csv', '.log')
+
+
 # Function to get random filetype
 def get_random_extension():
     """
@@ -71,7 +66,7 @@ def get_random_extension():
         str: Random file extension. From ('.txt', '.csv', '.log')
     """
 
-    file_types = ('.txt', '.csv', '.log')
+    file_types = FILE_TYPES
     random_file_type = rd.choice(file_types)
     return random_file_type
 
@@ -90,6 +85,106 @@ def get_random_filename():
     return random_filename
 
 
+# --------------------------------------------------------------------------- #
+# Generator for large numbers of random files.
+# Names are generated in bulk and made unique in memory, the folder is
+# created once, and the files are created by a pool of threads.
+
+def generate_unique_filenames(count, extensions=FILE_TYPES, existing=(),
+                              min_length=5, max_length=10):
+    """
+    Generates unique random filenames with 5-10 lowercase letters and a
+    random extension.
+
+    Args:
+        count (int): Number of filenames.
+        extensions (tuple[str]): Extensions to choose from.
+        existing (Iterable[str]): Filenames that must not be generated,
+            like the files already in the folder.
+    Returns:
+        list[str]: The filenames.
+    """
+    letters = string.ascii_lowercase
+    possible_names = len(extensions) * sum(
+        len(letters) ** length for length in range(min_length, max_length + 1))
+    taken = set(existing)
+    if count + len(taken) > possible_names:
+        raise ValueError(f'Can\'t generate {count} unique filenames')
+
+    filenames = []
+    while len(filenames) < count:
+        missing = count - len(filenames)
+        lengths = rd.choices(range(min_length, max_length + 1), k=missing)
+        for length, extension in zip(lengths,
+                                     rd.choices(extensions, k=missing)):
+            filename = ''.join(rd.choices(letters, k=length)) + extension
+            if filename not in taken:
+                taken.add(filename)
+                filenames.append(filename)
+    return filenames
+
+
+def write_files(folder, filenames, content_sizes, content):
+    """
+    Creates the files in a folder. Used by the threads in create_random_files.
+
+    Returns:
+        int: Number of files created.
+    """
+    created = 0
+    for filename, size in zip(filenames, content_sizes):
+        try:
+            with open(os.path.join(folder, filename), 'xb') as file:
+                if size:
+                    file.write(content[:size])
+            created += 1
+        except FileExistsError:
+            continue
+    return created
+
+
+def create_random_files(count=100, foldername='Files', extensions=FILE_TYPES,
+                        content_size=0, workers=None, batch_size=1000):
+    """
+    Creates "count" random files in a folder using a pool of threads.
+
+    Args:
+        count (int): Number of files.
+        foldername (str): The folder, created if missing.
+        extensions (tuple[str]): Extensions to choose from.
+        content_size (int | tuple[int, int]): Bytes of content in every
+            file, or a (min, max) range for random sizes.
+        workers (int, optional): Number of threads.
+        batch_size (int): Files per task given to a thread.
+    Returns:
+        tuple[int, float]: Files created and the time it took in seconds.
+    """
+    start = time.perf_counter()
+    folder = set_file_path('', foldername)
+    os.makedirs(folder, exist_ok=True)
+    filenames = generate_unique_filenames(count, extensions,
+                                          existing=os.listdir(folder))
+
+    if isinstance(content_size, tuple):
+        content_sizes = [rd.randint(*content_size) for _ in range(count)]
+    else:
+        content_sizes = [content_size] * count
+    # One shared buffer of content, sliced for every file.
+    content = ''.join(rd.choices(string.ascii_lowercase,
+                                 k=max(content_sizes, default=0))).encode()
+
+    names = iter(filenames)
+    sizes = iter(content_sizes)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        while batch := list(islice(names, batch_size)):
+            futures.append(executor.submit(
+                write_files, folder, batch,
+                list(islice(sizes, batch_size)), content))
+        created = sum(future.result() for future in futures)
+    return created, time.perf_counter() - start
+
+
 # --------------------------------------------------------------------------- #
 # Tasks 4A
 
@@ -101,18 +196,9 @@ def tasks_4a():
     Each file has a random name and one of these extensions: [.txt, .csv, .log].
     """
     foldername = 'Files'
-    i = 0
-    while i < 100:
-        filename = f'{get_random_filename()}'
-        filetype = f'{get_random_extension()}'
-        full_filename = filename + filetype
-        full_path = set_file_path(full_filename, foldername)
-        try:
-            with open(full_path, 'x'):
-                i+=1
-        except FileExistsError:
-            continue
+    i, seconds = create_random_files(100, foldername)
     print(f'{i} random files created and placed in folder: [{foldername}]')
+    print(f'({i / seconds:.0f} files/sec)')
 
 
 # --------------------------------------------------------------------------- #
@@ -122,33 +208,19 @@ def tasks_4a():
 def tasks_4b():
     """
     Sorts files in 'Files' into 'SortedFiles' subfolders by file type.
+    The sorting itself is done by "sort_files" in file_sorter, logging
+    the moves to a journal. A sort that was interrupted is finished first.
     """
     original_foldername = 'Files'
     sorted_folder = 'SortedFiles'
-    files = os.listdir(original_foldername)
-
-    files_moved = {}
-    files_existed = {}
-    for file in files:
-        original_path = set_file_path(file, original_foldername)
-
-        if os.path.isfile(original_path):
-            file_name, file_ext = os.path.splitext(file)
-            file_ext = file_ext.lstrip('.')
-
-            # Creating sub directory
-            sub_directory = set_file_path(
-                '', os.path.join(sorted_folder, f'{file_ext}-files'))
-
-            # Creating path for moving file.
-            new_path = set_file_path(file, sub_directory)
-
-            # Trying to move file and logging.
-            if not os.path.exists(new_path):
-                os.rename(original_path, new_path)
-                files_moved[file_ext] = files_moved.get(file_ext, 0) +1
-            else:
-                files_existed[file_ext] = files_existed.get(file_ext, 0) + 1
+    journal_path = f'{sorted_folder}.journal'
+    if os.path.exists(journal_path):
+        resumed = resume_moves(journal_path)
+        if resumed:
+            print(f'Resumed an interrupted sort: {resumed} files moved')
+    files_moved, files_existed = sort_files(original_foldername,
+                                            sorted_folder,
+                                            journal_path=journal_path)
 
     # Log of what files has been moved and to what folder
     for ext, amount in files_moved.items():
@@ -161,12 +233,53 @@ def tasks_4b():
             print(f"{count} {ext}-files already existed in their target folders.")
 
     # Checks if the original folder is empty then removes it
-    if not os.listdir(original_foldername):
+    if is_empty_folder(original_foldername):
         os.rmdir(original_foldername)
         print()
         print(f'Directory: {original_foldername} is now empty. Deleting!')
 
 
+# --------------------------------------------------------------------------- #
+# Task 4B, rollback
+
+@logging_current_task('4B (rollback)')
+def tasks_4b_rollback():
+    """
+    Moves the files of the last sort by tasks_4b back into 'Files'.
+    """
+    journal_path = 'SortedFiles.journal'
+    if not os.path.exists(journal_path):
+        print('No sort to roll back.')
+        return
+    moved_back = rollback_moves(journal_path)
+    print(f'{moved_back} files moved back to: [Files]')
+
+
+# --------------------------------------------------------------------------- #
+# Task 4B, watch mode
+
+@logging_current_task('4B (watch mode)')
+def tasks_4b_watch():
+    """
+    Keeps sorting files from 'Files' into 'SortedFiles' as they arrive,
+    until stopped with Ctrl+C.
+    """
+    watcher = SortingWatcher('Files', 'SortedFiles')
+
+    def print_batch(files_moved, files_existed):
+        for ext, amount in files_moved.items():
+            print(f'{amount} {ext}-files moved to corresponding folder')
+        for ext, count in files_existed.items():
+            print(f"{count} {ext}-files already existed in their target folders.")
+
+    print('Watching folder: [Files]. Press Ctrl+C to stop.')
+    try:
+        watcher.run(on_batch=print_batch)
+    except KeyboardInterrupt:
+        watcher.stop()
+    print(f'Files moved in total: {sum(watcher.files_moved.values())}')
+
+
 # --------------------------------------------------------------------------- #
 # Main
 
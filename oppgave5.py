@@ -1,9 +1,12 @@
-import csv
-from datetime import datetime
 import os
-from functools import wraps
 
-os.chdir(os.path.dirname(os.path.realpath(__file__)))
+from instrumentation import logging_current_task
+from loans import (CsvErrorSink, LoanedBooks, LoanedBooksList,
+                   LoanReportEngine, LoanTable, as_loan_reports,
+                   create_task_report_engine, load_loan_table,
+                   read_csv_in_chunks, run_task_reports_in_parallel,
+                   run_task_reports_incrementally)
+
 # --------------------------------------------------------------------------- #
 
 """
@@ -72,199 +75,90 @@ skal de sorteres alfabetisk. Skriv ut svaret.
 """
 
 # --------------------------------------------------------------------------- #
-# The Decorator is contained within the actual task-file instead
-# of being imported to show it being used for this task, and how.
-# Decorator to log what task is currently running.
-def logging_current_task(task_id):
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            print(f'Now running task: {task_id}')
-            result = func(*args, **kwargs)
-            print()
-            return result
-        return wrapper
-    return decorator
-
-
-# Generator to read CSV file.
-def read_csv_in_chunks(filename):
+# Function to create a list of objects (LoanedBooks) from the CSV file.
+# It also creates a separate file called "errors_from_csv.txt"
+@logging_current_task('"Reading file and creating list with objects"')
+def create_class_list_from_csv(filename,
+                               error_sink=None) -> LoanedBooksList:
     """
-    Yields rows from a CSV file as dictionaries.
+    Creates a list of LoanedBooks from a CSV file and logs errors.
+    Errors are streamed to "error_sink", a CsvErrorSink writing to
+    "errors_from_csv.txt" by default.
     """
-    with open(filename, 'r', encoding='utf-8') as csvfile:
-        csv_reader = csv.DictReader(csvfile)
-        for row in csv_reader:
-            yield row
+    bookloans_list = LoanedBooksList()
+    error_sink = error_sink or CsvErrorSink()
 
+    with error_sink:
+        for line_number, row in read_csv_in_chunks(filename,
+                                                   with_line_numbers=True):
+            try:
+                bookloans_list.append(LoanedBooks.from_dict(row))
+            except ValueError as e:
+                error_sink.add(line_number, row, e)
 
-# Class LoanedBooks blueprint to easily work with the data from the CSV File.
-class LoanedBooks:
-    """
-    Represents a loaned book with details about the loan.
-    """
-
-    valid_genres = {'fiksjon', 'krim', 'sakprosa', 'fantasy'}
-    valid_returned_values = {'ja', 'nei'}
-
-    def __init__(self, first_name, last_name, book_title, genre,
-                 loan_date, returned, loan_period=14, extended=0):
-        if not self.validate_date(loan_date):
-            raise ValueError('Invalid date format for "Lånedato"')
-        if not self.validate_int(loan_period):
-            raise ValueError('"Låneperiode" must be an integer')
-        if not self.validate_int(extended):
-            raise ValueError('"Forlenget" must be an integer')
-        if not self.validate_return(returned):
-            raise ValueError('"Returned" must be in list: ["Ja","Nei"]')
-        if not self.validate_genre(genre):
-            raise ValueError('"Genre" must be in list: '
-                             '["fiksjon", "krim", "sakprosa", "fantasy"]')
-
-        self.first_name = first_name
-        self.last_name = last_name
-        self.book_title = book_title
-        self.genre = genre
-        self.loan_date = datetime.strptime(loan_date, '%d/%m/%Y')
-        self.loan_period = int(loan_period)
-        self.extended = int(extended)
-        self.returned = returned
-
-    @classmethod
-    def create_object_from_dict(cls, data):
-        """
-        Creates a LoanedBooks object from a dictionary.
-
-        # Fornavn, Etternavn, Boktittel, Sjanger,
-        # Lånedato, Låneperiode, Forlenget, Tilbakelevert
-        """
-        try:
-            return cls(
-                data['Fornavn'], data['Etternavn'], data['Boktittel'],
-                data['Sjanger'], data['Lånedato'], data['Tilbakelevert'],
-                loan_period=data.get('Låneperiode', 14),
-                extended=data.get('Forlenget', 0)
-            ), None
-        except ValueError as e:
-            return None,f'Error on row: {data} | Error: {e}'
-
-    @classmethod
-    def validate_return(cls, returned):
-        """
-        Validates if the return status is valid.
-        """
-        return returned.lower() in cls.valid_returned_values
-
-    @classmethod
-    def validate_genre(cls, genre):
-        """
-        Validates if the genre is valid.
-        """
-        return genre.lower() in cls.valid_genres
-
-    @staticmethod
-    def validate_name(name):
-        """
-        Validates if the name contains only letters.
-        """
-        return name.isalpha()
-
-    @staticmethod
-    def validate_date(date_str):
-        """
-        Validates if a date is in 'dd/mm/yyyy' format.
-        """
-        try:
-            datetime.strptime(date_str, '%d/%m/%Y')
-            return True
-        except ValueError:
-            return False
-
-    @staticmethod
-    def validate_int(value):
-        """
-        Validates if a value is an integer.
-        """
-        if isinstance(value, int):
-            return True
-        try:
-            value = int(value)
-            return value >= 0
-        except ValueError:
-            return False
-
-
-    def __str__(self):
-        return (f'{self.book_title} was loaned out to '
-                f'{self.first_name} {self.last_name} '
-                f'on date {self.loan_date}')
-
-    def returned_on_time(self):
-        """
-        Checks if the book was returned on time.
-        """
-        if self.returned.lower() == 'ja':
-            return True
-        return False
-
-    def check_extension(self):
-        """
-        Returns the number of days the loan was extended.
-        """
-        return self.extended
-
-    def get_title(self):
-        """
-        Returns the title of the book.
-        """
-        return self.book_title
-
-    def get_genre(self):
-        """
-        Returns the genre of the book.
-        """
-        return self.genre
-
-    def get_loan_period(self):
-        """
-        Returns the total loan period, including extensions.
-        """
-        return self.loan_period + self.extended
-
-    def get_full_name_loaner(self):
-        """
-        Returns the full name of the loaner.
-        """
-        return f'{self.first_name} {self.last_name}'
+    print(f'{len(bookloans_list)} entries were handled correctly')
+    error_sink.print_summary()
+    return bookloans_list
 
 
-# --------------------------------------------------------------------------- #
-# Function to create a list of objects (LoanedBooks) from the CSV file.
-# It also creates a separate file called "errors_from_csv.txt"
-@logging_current_task('"Reading file and creating list with objects"')
-def create_class_list_from_csv(filename)-> list[LoanedBooks]:
+# Function to create a LoanTable from the CSV file.
+# It logs errors to "errors_from_csv.txt" the same way as the list version.
+@logging_current_task('"Reading file and creating table of loans"')
+def create_loan_table_from_csv(filename, use_snapshot=False) -> LoanTable:
     """
-    Creates a list of LoanedBooks from a CSV file and logs errors.
+    Creates a LoanTable from a CSV file and logs errors.
+    With "use_snapshot" the validated data is loaded from a binary snapshot
+    next to the CSV file when it is up to date.
     """
-    bookloans_list = []
-    errors_from_csv = []
     error_file = 'errors_from_csv.txt'
-
-    for row in read_csv_in_chunks(filename):
-        bookloan, error = LoanedBooks.create_object_from_dict(row)
-        if error:
-            errors_from_csv.append(error)
+    if use_snapshot:
+        loan_table, errors_from_csv = load_loan_table(filename)
+        print(f'{len(loan_table)} entries were handled correctly')
+        write_errors_to_file(errors_from_csv, error_file)
+        return loan_table
+
+    # Errors are streamed to the error file while reading.
+    with CsvErrorSink(error_file) as error_sink:
+        loan_table, _ = LoanTable.from_csv(filename, error_sink)
+    print(f'{len(loan_table)} entries were handled correctly')
+    error_sink.print_summary()
+    return loan_table
+
+
+# Function to run the reports for tasks 5A-5E in one pass over the CSV file.
+@logging_current_task('"Reading file and aggregating loans"')
+def run_loan_reports(filename, workers=1,
+                     incremental=False) -> LoanReportEngine:
+    """
+    Runs all reports for tasks 5A-5E in one pass and logs errors.
+    With more than one worker the file is read in parallel processes.
+    In incremental mode only rows appended since the last run are read.
+    """
+    # Errors are streamed to the error file, in file order, in every mode.
+    with CsvErrorSink('errors_from_csv.txt') as error_sink:
+        if incremental:
+            engine = run_task_reports_incrementally(filename,
+                                                    error_sink=error_sink)
+        elif workers != 1:
+            engine = run_task_reports_in_parallel(filename, workers,
+                                                  error_sink)
         else:
-            bookloans_list.append(bookloan)
+            engine = create_task_report_engine(
+                error_sink=error_sink).run(filename)
+    print(f'{engine.rows_handled} entries were handled correctly')
+    error_sink.print_summary()
+    return engine
 
-    print(f'{len(bookloans_list)} entries were handled correctly')
 
+def write_errors_to_file(errors_from_csv, error_file):
+    """
+    Writes errors from reading the CSV file to the error file, if any.
+    """
     if errors_from_csv:
         with open(error_file, 'w', encoding='utf-8') as error_writer:
             for error in errors_from_csv:
                 error_writer.write(f'{error}\n')
         print(f'Found {len(errors_from_csv)} Errors. Details in {error_file}')
-    return bookloans_list
 
 # --------------------------------------------------------------------------- #
 # Oppgave 5A
@@ -273,9 +167,7 @@ def total_days_books_were_extended(loanedbooks_list):
     """
     Calculates total days all loans were extended.
     """
-    total_days = 0
-    for book in loanedbooks_list:
-        total_days += book.extended
+    total_days = as_loan_reports(loanedbooks_list).total_extended()
     print(f'Total days all loaned out books were extended: {total_days}')
 
 
@@ -299,11 +191,8 @@ def count_books_per_genre(loanedbooks_list):
     """
     Counts books loaned out per genre.
     """
-    loaned_books_per_genra = {}
-    for book in loanedbooks_list:
-        if not book.returned_on_time():
-            loaned_books_per_genra[book.genre] = loaned_books_per_genra.get(
-                book.genre, 0) + 1
+    loaned_books_per_genra = (
+        as_loan_reports(loanedbooks_list).count_genres_not_returned())
     print('Current amount of books loaned out per genre is: ')
     for genre, amount in loaned_books_per_genra.items():
         print(f'{genre}: {amount}')
@@ -317,10 +206,8 @@ def get_average_loan_length(loanedbooks_list):
     """
     Calculates the average loan length of all books from the CSV file.
     """
-    total = 0
-    for book in loanedbooks_list:
-        total += book.get_loan_period()
-    print(f'Average loan lenght: {total/len(loanedbooks_list):.2f} days')
+    average = as_loan_reports(loanedbooks_list).average_loan_length()
+    print(f'Average loan lenght: {average:.2f} days')
 
 
 # --------------------------------------------------------------------------- #
@@ -344,12 +231,8 @@ def count_books_not_returned_on_time(loanedbooks_list):
     """
     Lists books not returned on time with their loaners.
     """
-    currently_not_returned = []
-    for book in loanedbooks_list:
-        if not book.returned_on_time():
-            currently_not_returned.append(
-                f'Book: {book.book_title},'
-                f' Loaner: {book.get_full_name_loaner()}')
+    currently_not_returned = (
+        as_loan_reports(loanedbooks_list).not_returned_loans())
     for i in currently_not_returned:
         print(i)
     return currently_not_returned
@@ -359,22 +242,20 @@ def count_books_not_returned_on_time(loanedbooks_list):
 # Oppgave 5E
 
 @logging_current_task('5E')
-def get_most_loaned_book(loanedbooks_list):
+def get_most_loaned_book(loanedbooks_list, top_k=None):
     """
     Lists the most loaned books in descending order by number if there are
     more than 1 with the same amount it does it alphabeticly asc order.
 
+    With "top_k" only the k most loaned books are found, using a bounded
+    heap instead of sorting every title.
+    Returns the list of (title, amount) tuples.
     """
-    total_loans_per_book = {}
-    for book in loanedbooks_list:
-        total_loans_per_book[book.book_title] = (total_loans_per_book.get
-                                                 (book.book_title, 0) + 1)
-    sorted_books = sorted(
-        total_loans_per_book.items(), key=lambda x: (-x[1], x[0].lower())
-    )
+    sorted_books = as_loan_reports(loanedbooks_list).most_loaned(top_k)
     print(f'most loaned books:')
     for idx, book in enumerate(sorted_books):
         print(f'{idx+1}.\t"{book[0]}" | Amount: {book[1]}')
+    return sorted_books
 
 
 # --------------------------------------------------------------------------- #
@@ -382,19 +263,22 @@ def get_most_loaned_book(loanedbooks_list):
 def main():
     """
     Executes all tasks for processing and analyzing loaned books.
+    All reports are calculated in one pass over the CSV file, so memory use
+    stays the same regardless of file size.
     """
 
-    loaned_books_list = create_class_list_from_csv('bokutlån.csv')
-    if not loaned_books_list:
+    loan_reports = run_loan_reports('bokutlån.csv')
+    if not loan_reports.rows_handled:
         print('No bookloans with valid data found. Exiting')
         return
 
-    total_days_books_were_extended(loaned_books_list)
-    count_books_per_genre(loaned_books_list)
-    get_average_loan_length(loaned_books_list)
-    not_returned_list = count_books_not_returned_on_time(loaned_books_list)
-    get_most_loaned_book(loaned_books_list)
+    total_days_books_were_extended(loan_reports)
+    count_books_per_genre(loan_reports)
+    get_average_loan_length(loan_reports)
+    not_returned_list = count_books_not_returned_on_time(loan_reports)
+    get_most_loaned_book(loan_reports)
 
 # --------------------------------------------------------------------------- #
 if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.realpath(__file__)))
     main()
@@ -0,0 +1,171 @@
+from fractions import Fraction
+from functools import lru_cache
+from math import comb, lcm
+import random as rd
+
+# --------------------------------------------------------------------------- #
+"""
+Sums of ranges of integers in constant time, for task 1A.
+
+range_sum(start, stop, step) is the same as sum(range(start, stop, step)),
+but uses the formula for arithmetic series instead of adding the numbers
+one by one. With "power", it sums the powers of the numbers using
+Faulhaber's formula. With "modulus", the sum is reduced modulo a number
+without computing the full sum.
+"""
+
+
+# --------------------------------------------------------------------------- #
+# Faulhaber's formula
+
+@lru_cache(maxsize=None)
+def bernoulli_numbers(count):
+    """
+    Returns the first count Bernoulli numbers, with B1 = +1/2 as used in
+    Faulhaber's formula.
+    """
+    numbers = []
+    for m in range(count):
+        if m == 0:
+            numbers.append(Fraction(1))
+            continue
+        numbers.append(-sum(comb(m + 1, k) * numbers[k] for k in range(m))
+                       / (m + 1))
+    if count > 1:
+        numbers[1] = Fraction(1, 2)
+    return tuple(numbers)
+
+
+@lru_cache(maxsize=None)
+def power_sum_polynomial(power):
+    """
+    Returns Faulhaber's polynomial for 1**power + 2**power + ... + m**power,
+    with integer coefficients and a common denominator.
+
+    Returns:
+        tuple[tuple[int, ...], int]: The coefficients, from the highest
+        power of m down to the constant, and the denominator.
+    """
+    bernoulli = bernoulli_numbers(power + 1)
+    coefficients = [Fraction(comb(power + 1, j)) * bernoulli[j] / (power + 1)
+                    for j in range(power + 1)] + [Fraction(0)]
+    denominator = lcm(*(c.denominator for c in coefficients))
+    return (tuple(int(c * denominator) for c in coefficients), denominator)
+
+
+def power_sum(m, power, modulus=None):
+    """
+    Returns 0**power + 1**power + ... + m**power (with 0**0 = 1), or the
+    sum modulo "modulus".
+
+    The polynomial is evaluated modulo denominator * modulus, so the
+    numbers stay small however large m is.
+    """
+    if m < 0:
+        return 0
+    if power == 0:
+        return m + 1 if modulus is None else (m + 1) % modulus
+    coefficients, denominator = power_sum_polynomial(power)
+    if modulus is None:
+        value = 0
+        for coefficient in coefficients:
+            value = value * m + coefficient
+        return value // denominator
+    reduce_by = denominator * modulus
+    value = 0
+    for coefficient in coefficients:
+        value = (value * m + coefficient) % reduce_by
+    return value // denominator
+
+
+# --------------------------------------------------------------------------- #
+# Range sums
+
+def range_sum(start, stop=None, step=1, power=1, modulus=None):
+    """
+    Sums the numbers of range(start, stop, step) in constant time.
+
+    Args:
+        start (int): The first number, or the stop if stop is None.
+        stop (int, optional): The number to stop before.
+        step (int): The difference between the numbers. Can be negative.
+        power (int): Sums every number to this power (0 counts them).
+        modulus (int, optional): Returns the sum modulo this number.
+    Returns:
+        int: The same as sum(x ** power for x in range(start, stop, step)),
+        modulo "modulus" if given.
+    Raises:
+        ValueError: If step is 0, power is negative or modulus is not
+            positive.
+    """
+    if stop is None:
+        start, stop = 0, start
+    if step == 0:
+        raise ValueError('"step" must not be zero')
+    if power < 0:
+        raise ValueError('"power" must be 0 or more')
+    if modulus is not None and modulus < 1:
+        raise ValueError('"modulus" must be a positive integer')
+
+    # len(range()) is limited to sys.maxsize, so the count is computed.
+    if step > 0:
+        count = max(0, (stop - start + step - 1) // step)
+    else:
+        count = max(0, (start - stop - step - 1) // -step)
+    if count == 0:
+        return 0
+    if power == 1 and modulus is None:
+        return count * start + step * (count * (count - 1) // 2)
+
+    # (start + k*step)**power expanded with the binomial theorem, summed
+    # over k = 0 .. count - 1 with Faulhaber's formula per term.
+    total = 0
+    for i in range(power + 1):
+        term = (comb(power, i) * start ** (power - i) * step ** i
+                if modulus is None else
+                comb(power, i) * pow(start, power - i, modulus)
+                * pow(step, i, modulus))
+        total += term * power_sum(count - 1, i, modulus)
+    return total if modulus is None else total % modulus
+
+
+def sum_to(n):
+    """
+    Returns 1 + 2 + ... + n, or 0 if n is less than 1.
+    """
+    return n * (n + 1) // 2 if n > 0 else 0
+
+
+# --------------------------------------------------------------------------- #
+# Verification
+
+def loop_range_sum(start, stop, step=1, power=1, modulus=None):
+    """
+    range_sum done with a loop, used to verify the closed forms.
+    """
+    total = sum(x ** power for x in range(start, stop, step))
+    return total if modulus is None else total % modulus
+
+
+def verify_range_sum(samples=1000, max_value=1000, max_power=6, seed=1):
+    """
+    Checks range_sum against loop_range_sum on random inputs. The inputs
+    come from a generator of its own, so the global random state used by
+    other modules is left alone.
+
+    Returns:
+        list[tuple]: The arguments where the results differ. Empty if the
+        closed forms are right for every sample.
+    """
+    rng = rd.Random(seed)
+    mismatches = []
+    for _ in range(samples):
+        start = rng.randint(-max_value, max_value)
+        stop = rng.randint(-max_value, max_value)
+        step = rng.choice([-1, 1]) * rng.randint(1, 10)
+        power = rng.randint(0, max_power)
+        modulus = rng.choice([None, rng.randint(1, 10**9)])
+        arguments = (start, stop, step, power, modulus)
+        if range_sum(*arguments) != loop_range_sum(*arguments):
+            mismatches.append(arguments)
+    return mismatches